@@ -1,86 +1,186 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import datetime
-from groq import Groq
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import bcrypt
+import functools
+import json
+import time
+
+from chat_history import ChatHistory, build_prompt
+from chat_pipeline import ChatTurn, REFUSAL_REPLY
+from topic_classifier import load_classifier
+from journal_store import JournalStore
+from memory_worker import MemorySummarizer
+from mood_analytics import analyze
+from metrics import Metrics
+from journal_stats import DashboardCache, downsample
+from llm_gateway import BACKGROUND, USER
+from passwords import PasswordHasher, calibrate
+from resources import Resources
+from session_store import MemorySessionStore, SQLiteSessionStore, SessionSync, known_token, new_token
+from response_cache import ResponseCache
+from user_store import SheetsUserStore, SQLiteUserStore
+from utils import TTSCache, autoplay_audio, text_to_speech
+import vision
+
+_RERUN_START = time.perf_counter()
+
+# Must stay the first Streamlit command: cache misses below (the spinner
+# of a @st.cache_resource) and st.query_params both send page elements
+st.set_page_config(
+    page_title="MindCare Companion",
+    page_icon="💛",
+    layout="wide",
+    initial_sidebar_state="auto"
+)
 
-import cv2
-import numpy as np
+# ---------- SHARED CLIENTS ----------
+@st.cache_resource
+def get_resources():
+    # One Groq client and one Sheets connection per process, opened lazily
+    return Resources(st.secrets)
 
-# Load Haar cascade once
-FACE_CASCADE = cv2.CascadeClassifier(
-    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-)
 
-def detect_face_and_emotion(image_bytes):
-    """
-    Very lightweight emotion heuristic.
-    Returns: emotion label or None
-    """
-    # Convert image bytes to OpenCV image
-    img_array = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+def get_llm(priority=USER):
+    # Groq client behind the shared rate limiter, retries and concurrency cap
+    return get_resources().llm().for_priority(priority)
 
-    faces = FACE_CASCADE.detectMultiScale(gray, 1.3, 5)
 
-    if len(faces) == 0:
-        return None, "No face detected"
+# ---------- METRICS ----------
+DEBUG = bool(st.secrets.get("DEBUG", False))
+# Stage timings are only collected (and the panel shown) when enabled
+METRICS = bool(st.secrets.get("METRICS", DEBUG))
 
-    # Take first detected face
-    (x, y, w, h) = faces[0]
-    face_roi = gray[y:y+h, x:x+w]
 
-    # VERY SIMPLE emotion heuristic (hackathon-safe)
-    brightness = np.mean(face_roi)
+@st.cache_resource
+def get_metrics():
+    return Metrics(
+        enabled=METRICS,
+        jsonl_path=st.secrets.get("METRICS_JSONL"),
+        prometheus_path=st.secrets.get("METRICS_PROM_PATH")
+    )
 
-    if brightness < 90:
-        emotion = "sad / low"
-    elif brightness < 130:
-        emotion = "neutral"
-    else:
-        emotion = "positive"
 
-    return emotion, "Face detected"
+def timed_fragment(name):
+    # st.fragment whose body is timed as `name`, whether it runs as part
+    # of a full rerun or on its own
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with get_metrics().fragment(name):
+                return fn(*args, **kwargs)
+        return st.fragment(run)
+    return wrap
 
 
+get_metrics().begin_rerun()
 
-# Connect to Google Sheet
-scope = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_dict(st.secrets["service_account"], scope)
-client_gs = gspread.authorize(creds)
 
-sheet = client_gs.open("mindcare_users").sheet1
+# ---------- USER STORE ----------
+# "sheets" (the mindcare_users Google Sheet) or "sqlite" (local file, no network)
+USER_STORE = st.secrets.get("USER_STORE", "sheets")
+USER_DB_PATH = st.secrets.get("USER_DB_PATH", "mindcare_users.db")
+# Signups are queued here until they are batched into the sheet
+SIGNUP_SPOOL_PATH = st.secrets.get("SIGNUP_SPOOL_PATH", "signup_spool.jsonl")
+
+
+@st.cache_resource
+def get_user_store():
+    # Shared by every session in this process
+    if USER_STORE == "sqlite":
+        return SQLiteUserStore(USER_DB_PATH)
+    return SheetsUserStore(
+        get_resources().sheet,
+        spool_path=SIGNUP_SPOOL_PATH,
+        batch_size=int(st.secrets.get("SIGNUP_BATCH_SIZE", 20)),
+        flush_interval=float(st.secrets.get("SIGNUP_FLUSH_SECONDS", 2.0))
+    )
+
+
+@st.cache_resource
+def get_password_hasher():
+    # BCRYPT_ROUNDS pins the cost; otherwise it is calibrated once per process
+    rounds = st.secrets.get("BCRYPT_ROUNDS")
+    if rounds is None:
+        rounds = calibrate(float(st.secrets.get("BCRYPT_TARGET_MS", 250)) / 1000)
+    return PasswordHasher(int(rounds))
 
-# ---- ✅ ADD THE TWO FUNCTIONS HERE ----
 
 def register_user(username, email, password):
-    password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-    existing_users = sheet.col_values(1)
-    if username in existing_users:
+    store = get_user_store()
+    metrics = get_metrics()
+    with metrics.span("user_lookup"):
+        exists = store.get_password_hash(username) is not None
+    if exists:
+        return False, "Username already exists."
+    with metrics.span("bcrypt_hash"):
+        password_hash = get_password_hasher().hash(password)
+    with metrics.span("user_add"):
+        added = store.add_user(username, email, password_hash)
+    if not added:
         return False, "Username already exists."
-    sheet.append_row([username, email, password_hash])
     return True, "Account created successfully!"
 
 def login_user(username, password):
-    users = sheet.get_all_records()
-    for user in users:
-        if user["username"] == username:
-            if bcrypt.checkpw(password.encode(), user["password_hash"].encode()):
-                return True
-    return False
-
-if "logged_in" not in st.session_state:
-    st.session_state.logged_in = False
-
+    store = get_user_store()
+    hasher = get_password_hasher()
+    metrics = get_metrics()
+    with metrics.span("user_lookup"):
+        password_hash = store.get_password_hash(username)
+    if password_hash is None:
+        return False
+    with metrics.span("bcrypt_verify"):
+        valid = hasher.verify(password, password_hash)
+    if not valid:
+        return False
+    if hasher.needs_rehash(password_hash):
+        hasher.rehash_async(password, lambda new_hash: store.update_password_hash(username, new_hash))
+    return True
+
+
+# ---------- SESSION STORE ----------
+# "memory" (this process only) or "sqlite" (a file shared by every worker on the host)
+SESSION_STORE = st.secrets.get("SESSION_STORE", "memory")
+SESSION_DB_PATH = st.secrets.get("SESSION_DB_PATH", "mindcare_sessions.db")
+SESSION_TTL_HOURS = float(st.secrets.get("SESSION_TTL_HOURS", 12))
+
+
+@st.cache_resource
+def get_session_store():
+    # Conversations nobody has come back to are dropped now and periodically
+    max_age = float(st.secrets.get("SESSION_MAX_AGE_DAYS", 30)) * 86400
+    if SESSION_STORE == "sqlite":
+        store = SQLiteSessionStore(SESSION_DB_PATH, max_age=max_age)
+    else:
+        # Kept in this process's memory, so also capped in size
+        store = MemorySessionStore(int(st.secrets.get("SESSION_MEMORY_MAX_ENTRIES", 5000)), max_age=max_age)
+    store.purge(max_age)
+    return store
+
+
+# The token rides in the URL (?sid=...), so a reconnect to any worker
+# process finds the same login and conversation. A token the store has
+# never seen is replaced rather than adopted.
+if "session_sync" not in st.session_state:
+    token = st.query_params.get("sid")
+    if not token or not known_token(get_session_store(), token):
+        token = new_token()
+    st.query_params["sid"] = token
+    st.session_state.session_sync = SessionSync(get_session_store(), token, auth_ttl=SESSION_TTL_HOURS * 3600)
+    st.session_state.logged_in, st.session_state.username = st.session_state.session_sync.load_auth()
+
+
+def save_session():
+    # Writes only what changed since the last save, in one write
+    with get_metrics().span("session_save"):
+        st.session_state.session_sync.flush(
+            st.session_state.logged_in, st.session_state.username, st.session_state.history,
+            st.session_state.memory_worker.memory, st.session_state.memory_worker.checkpoint
+        )
 
 
 
 
-# ---------- LOAD API KEY ----------
-client = Groq(api_key=st.secrets["GROQ_API_KEY"])
 
 SYSTEM_PROMPT = """
 You are a gentle, warm mental health support companion.
@@ -123,14 +223,54 @@ If the user asks anything NOT related to emotional or mental well-being
 
 MODEL_NAME = "llama-3.1-8b-instant"
 
+# Load OpenCV in the background at startup instead of on the first camera check
+if st.secrets.get("VISION_PREWARM", False):
+    vision.prewarm()
 
-# ---------- MEMORY ----------
-def update_memory(history, current_memory):
-    if len(history) < 6 or len(history) % 4 != 0:
-        return current_memory
+# Chat messages kept uncompressed per session, shown per page, and the
+# prompt size (in estimated tokens) recent conversation is fitted into
+HISTORY_CAPACITY = 40
+HISTORY_PAGE = 20
+PROMPT_TOKEN_BUDGET = int(st.secrets.get("PROMPT_TOKEN_BUDGET", 2000))
+
+# Camera photos kept per session for the smoothed emotion check
+CAMERA_BURST = 5
 
-    recent = history[-6:]
-    convo_text = "\n".join([f"{m['role']}: {m['content']}" for m in recent])
+# Local MENTAL verdicts below this confidence, and every local OTHER, are
+# escalated to the LLM check
+TOPIC_CONFIDENCE = float(st.secrets.get("TOPIC_CONFIDENCE", 0.99))
+
+
+@st.cache_resource
+def get_topic_classifier():
+    return load_classifier()
+
+
+@st.cache_resource
+def get_response_cache():
+    # Topic verdicts only; personalized replies are never cached
+    return ResponseCache(
+        max_entries=int(st.secrets.get("RESPONSE_CACHE_SIZE", 10000)),
+        ttl=float(st.secrets.get("RESPONSE_CACHE_TTL", 3600))
+    )
+
+
+# "browser" speaks replies with the browser's speechSynthesis; "local"
+# synthesizes them on the server (pyttsx3/espeak) into a shared disk cache
+TTS_ENGINE = st.secrets.get("TTS_ENGINE", "browser")
+
+
+@st.cache_resource
+def get_tts_cache():
+    return TTSCache(
+        st.secrets.get("TTS_CACHE_DIR", "tts_cache"),
+        max_bytes=int(st.secrets.get("TTS_CACHE_MB", 200)) * 2 ** 20
+    )
+
+
+# ---------- MEMORY ----------
+def summarize_memory(current_memory, messages):
+    convo_text = "\n".join([f"{m['role']}: {m['content']}" for m in messages])
 
     summary_prompt = f"""
 Summarize emotional tone only. Keep gentle and short.
@@ -142,25 +282,36 @@ Conversation:
 {convo_text}
 """
 
-    completion = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": summary_prompt}]
-    )
+    # Runs on the summarizer's thread, so it lands in the process histograms only
+    with get_metrics().span("memory_summary"):
+        completion = get_llm(BACKGROUND).chat.completions.create(
+            model=MODEL_NAME,
+            messages=[{"role": "user", "content": summary_prompt}]
+        )
 
     return completion.choices[0].message.content.strip()
 
 
-# ---------- UI CONFIG ----------
-st.set_page_config(
-    page_title="MindCare Companion",
-    page_icon="💛",
-    layout="wide",
-    initial_sidebar_state="auto"
-)
+# ---------- JOURNAL ----------
+@st.cache_resource
+def get_journal_store():
+    return JournalStore(st.secrets.get("JOURNAL_DIR", "journal"))
 
-st.markdown("""
-<style>
 
+@st.cache_resource
+def get_dashboard_cache():
+    return DashboardCache()
+
+
+MAX_CHART_POINTS = 365
+TABLE_PAGE_SIZE = 50
+
+
+# ---------- UI CONFIG ----------
+# All static CSS in one element. Fragment reruns leave it in place, and a
+# full rerun sends it once instead of as five separate blocks.
+APP_CSS = """
+<style>
 /* 1. Kill Streamlit toolbar & decoration space */
 div[data-testid="stToolbar"] {
     display: none !important;
@@ -191,13 +342,6 @@ main {
     padding-top: 0rem !important;
 }
 
-</style>
-""", unsafe_allow_html=True)
-
-
-
-st.markdown("""
-<style>
 [data-testid="stSidebar"] {
     min-width: 350px !important;
     max-width: 350px !important;
@@ -205,8 +349,35 @@ st.markdown("""
     backdrop-filter: blur(12px) !important;
     border-right: 2px solid rgba(255,255,255,0.3);
 }
+
+button[title="Toggle Menu"] {
+    font-size: 28px !important;      /* Bigger hamburger */
+    font-weight: 700 !important;
+    padding: 10px 18px !important;   /* Comfortable click size */
+    border-radius: 10px !important;
+    background: rgba(255, 255, 255, 0.85) !important;
+    border: 1.5px solid #d4bfff !important;
+    cursor: pointer;
+    position: fixed;                 /* So it stays visible */
+    top: 12px;
+    left: 12px;
+    z-index: 9999;
+}
+
+/* Hover effect */
+button[title="Toggle Menu"]:hover {
+    background: #f0e5ff !important;
+    border-color: #b388ff !important;
+}
+
+body {background: linear-gradient(135deg, #d6dce8, #f4e7f7);}
+#MainMenu, footer, header {visibility: hidden;}
+.big-title {text-align: center; font-size: 38px; font-weight: 900; color: #3b2b56;}
+.sub-title {text-align: center; color: #6a5b7e; font-size: 18px;}
+.glass-card {background: rgba(255,255,255,0.35); backdrop-filter: blur(12px); border-radius: 16px; padding: 25px; margin-top: 10px; box-shadow: 0 4px 28px rgba(0,0,0,0.08);}
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 
 # Default states
@@ -218,7 +389,10 @@ if "username" not in st.session_state:
 # ----------------------------
 #  SIDEBAR ACCOUNT SECTION
 # ----------------------------
-with st.sidebar:
+@timed_fragment("fragment_account")
+def account_section():
+    # Typing into the login/sign-up form reruns only this; logging in or
+    # out reruns the whole app
     st.title("Account")
 
     if st.session_state.logged_in:
@@ -227,6 +401,9 @@ with st.sidebar:
         if st.button("Logout"):
             st.session_state.logged_in = False
             st.session_state.username = None
+            st.query_params["sid"] = st.session_state.session_sync.logout()
+            for key in ("history", "memory_worker", "conversation_key", "history_window"):
+                st.session_state.pop(key, None)
             st.rerun()
 
     else:
@@ -241,6 +418,7 @@ with st.sidebar:
                 if login_user(username, password):
                     st.session_state.logged_in = True
                     st.session_state.username = username
+                    st.query_params["sid"] = st.session_state.session_sync.login()
                     st.success("Logged in successfully!")
                     st.rerun()
                 else:
@@ -260,77 +438,73 @@ with st.sidebar:
                     st.error(msg)
 
 
+with st.sidebar:
+    account_section()
+
+    if DEBUG:
+        st.caption(f"User store: {get_user_store().stats()}")
+        st.caption(f"Password hashing: {get_password_hasher().stats()}")
+        st.caption(f"Response cache: {get_response_cache().stats()}")
+        st.caption(f"Session store: {get_session_store().stats()}")
+        if TTS_ENGINE == "local":
+            st.caption(f"TTS cache: {get_tts_cache().stats()}")
+
+
 # --- SIDEBAR TOGGLE ---
 if "sidebar_state" not in st.session_state:
     st.session_state.sidebar_state = True   # True = Expanded, False = Collapsed
 
-# Toggle button (three dots icon)
-toggle = st.button("☰", help="Toggle Menu")
-
-if toggle:
-    st.session_state.sidebar_state = not st.session_state.sidebar_state
-
-# Apply CSS based on state
-if st.session_state.sidebar_state:
-    st.markdown("""
-    <style>
-    [data-testid="stSidebar"] {transform: translateX(0); transition: all 0.3s;}
-    </style>
-    """, unsafe_allow_html=True)
-else:
-    st.markdown("""
-    <style>
-    [data-testid="stSidebar"] {transform: translateX(-350px); transition: all 0.3s;}
-    </style>
-    """, unsafe_allow_html=True)
-
-st.markdown("""
-<style>
-button[title="Toggle Menu"] {
-    font-size: 28px !important;      /* Bigger hamburger */
-    font-weight: 700 !important;
-    padding: 10px 18px !important;   /* Comfortable click size */
-    border-radius: 10px !important;
-    background: rgba(255, 255, 255, 0.85) !important;
-    border: 1.5px solid #d4bfff !important;
-    cursor: pointer;
-    position: fixed;                 /* So it stays visible */
-    top: 12px;
-    left: 12px;
-    z-index: 9999;
-}
 
-/* Hover effect */
-button[title="Toggle Menu"]:hover {
-    background: #f0e5ff !important;
-    border-color: #b388ff !important;
-}
-</style>
-""", unsafe_allow_html=True)
+@timed_fragment("fragment_menu")
+def menu_toggle():
+    # Toggle button (three dots icon)
+    if st.button("☰", help="Toggle Menu"):
+        st.session_state.sidebar_state = not st.session_state.sidebar_state
 
+    # Apply CSS based on state
+    offset = "0" if st.session_state.sidebar_state else "-350px"
+    st.markdown(
+        f'<style>[data-testid="stSidebar"] {{transform: translateX({offset}); transition: all 0.3s;}}</style>',
+        unsafe_allow_html=True
+    )
 
-st.markdown("""
-<style>
-body {background: linear-gradient(135deg, #d6dce8, #f4e7f7);}
-#MainMenu, footer, header {visibility: hidden;}
-.big-title {text-align: center; font-size: 38px; font-weight: 900; color: #3b2b56;}
-.sub-title {text-align: center; color: #6a5b7e; font-size: 18px;}
-.glass-card {background: rgba(255,255,255,0.35); backdrop-filter: blur(12px); border-radius: 16px; padding: 25px; margin-top: 10px; box-shadow: 0 4px 28px rgba(0,0,0,0.08);}
-</style>
-""", unsafe_allow_html=True)
 
-st.markdown("<h1 class='big-title'>💛 MindCare Companion</h1>", unsafe_allow_html=True)
-st.markdown("<p class='sub-title'>Here to support you gently, one conversation at a time.</p>", unsafe_allow_html=True)
+menu_toggle()
+
+st.markdown(
+    "<h1 class='big-title'>💛 MindCare Companion</h1>"
+    "<p class='sub-title'>Here to support you gently, one conversation at a time.</p>",
+    unsafe_allow_html=True
+)
 
 
 # ---------- SESSION ----------
-if "memory" not in st.session_state:
-    st.session_state.memory = "The user may be sharing emotional thoughts."
+sync = st.session_state.session_sync
+conversation_key = sync.conversation_key(st.session_state.username if st.session_state.logged_in else None)
+if st.session_state.get("conversation_key") != conversation_key:
+    # New session or just logged in: pick up the stored conversation if
+    # there is one, otherwise keep the current one under the new key
+    with get_metrics().span("session_load"):
+        loaded = sync.load_conversation(conversation_key)
+    if loaded is not None:
+        history, memory, checkpoint = loaded
+        st.session_state.history = history
+        st.session_state.memory_worker = MemorySummarizer(summarize_memory, memory)
+        st.session_state.memory_worker.checkpoint = checkpoint
+        st.session_state.history_window = HISTORY_PAGE
+    st.session_state.conversation_key = conversation_key
+
+if "memory_worker" not in st.session_state:
+    st.session_state.memory_worker = MemorySummarizer(
+        summarize_memory, "The user may be sharing emotional thoughts."
+    )
 
 if "history" not in st.session_state:
-    st.session_state.history = [
+    st.session_state.history = ChatHistory([
         {"role": "assistant", "content": "Hey, I'm here with you. What’s on your mind?"}
-    ]
+    ], capacity=HISTORY_CAPACITY)
+if "history_window" not in st.session_state:
+    st.session_state.history_window = HISTORY_PAGE
 
 
 # ---------- SIDEBAR NAVIGATION ----------
@@ -343,38 +517,46 @@ with st.sidebar:
 #                         CHAT
 # =========================================================
 
-st.markdown("### 🎥 Optional Camera Check (Privacy-first)")
-st.caption(
-    "This feature is optional. The image is processed locally and never stored."
-)
+@timed_fragment("fragment_camera")
+def camera_check():
+    st.markdown("### 🎥 Optional Camera Check (Privacy-first)")
+    st.caption(
+        "This feature is optional. The image is processed locally and never stored."
+    )
 
-enable_cam = st.checkbox("Enable camera-based emotion check")
+    enable_cam = st.checkbox("Enable camera-based emotion check")
 
-detected_emotion = None
+    detected_emotion = None
 
-if enable_cam:
-    img = st.camera_input("Capture your current expression")
+    if enable_cam:
+        img = st.camera_input("Capture your current expression")
 
-    if img is not None:
-        emotion, msg = detect_face_and_emotion(img.getvalue())
+        if img is not None:
+            # Smooth over the last few captures instead of trusting one photo
+            frames = st.session_state.setdefault("camera_frames", [])
+            image_bytes = img.getvalue()
+            if not frames or frames[-1] != image_bytes:
+                frames.append(image_bytes)
+                del frames[:-CAMERA_BURST]
 
-        if emotion:
-            st.success(f"Detected emotional tone: **{emotion}**")
-            detected_emotion = emotion
-        else:
-            st.warning("No clear face detected. You can continue without this.")
+            with get_metrics().span("camera_detect"):
+                emotion, confidence, _ = vision.detect_emotion_batch(frames)
 
+            if emotion:
+                st.success(f"Detected emotional tone: **{emotion}** (confidence {confidence:.0%} over {len(frames)} photo(s))")
+                detected_emotion = emotion
+            else:
+                st.warning("No clear face detected. You can continue without this.")
 
-if page == "💬 Chat":
-    import json
-    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-    st.subheader("Talk to me")
+    # Read by the chat section, which can rerun without this fragment
+    st.session_state.detected_emotion = detected_emotion
 
-    import streamlit.components.v1 as components
 
-    st.markdown("### 🎤 Speak Instead of Typing")
+camera_check()
+
 
-    voice_input_html = """
+# Static, so it is built once per process rather than on every rerun
+VOICE_INPUT_HTML = """
 <div style="display:flex;align-items:center;gap:10px;">
     <input id="speech_input" type="text" placeholder="Speak or type..." 
         style="padding:10px;font-size:16px;width:300px;border-radius:8px;border:1px solid #ccc;">
@@ -428,20 +610,27 @@ document.getElementById("mic_btn").onclick = () => {
 </script>
 """
 
-    components.html(voice_input_html, height=120)
-
 
-    # Show existing conversation
-    for msg in st.session_state.history:
+# Sending a message or changing a TTS setting reruns only this
+@timed_fragment("fragment_chat")
+def chat_section():
+    # Show the latest page of the conversation
+    history = st.session_state.history
+    if len(history) > st.session_state.history_window:
+        if st.button(f"Load earlier messages ({len(history) - st.session_state.history_window} more)"):
+            st.session_state.history_window += HISTORY_PAGE
+    for msg in history.tail(st.session_state.history_window):
         with st.chat_message(msg["role"]):
             st.write(msg["content"])
 
     # TTS controls
-    tts_col1, tts_col2 = st.columns([1,1])
+    tts_col1, tts_col2, tts_col3 = st.columns([1,1,1])
     with tts_col1:
         tts_lang = st.selectbox("TTS language", options=["en-IN", "en-US", "hi-IN"], index=0, help="Choose voice language for narration")
     with tts_col2:
         autoplay = st.checkbox("Autoplay reply (may require a prior user gesture)", value=False)
+    with tts_col3:
+        stream_mode = st.checkbox("Stream replies", value=True, help="Show the reply as it is being written")
 
     # Single-line input like YouTube search (enter submits)
     with st.form("user_input_form", clear_on_submit=True):
@@ -450,106 +639,76 @@ document.getElementById("mic_btn").onclick = () => {
         submitted = st.form_submit_button("Send")
 
     if submitted and user_input:
+        recent = list(st.session_state.history.recent)
         st.session_state.history.append({"role": "user", "content": user_input})
-        st.session_state.memory = update_memory(st.session_state.history, st.session_state.memory)
-
-    if submitted and user_input:
-     st.session_state.history.append({"role": "user", "content": user_input})
-
-    # Update memory
-     st.session_state.memory = update_memory(
-        st.session_state.history,
-        st.session_state.memory
-     )
 
-    # 🎥 OPTIONAL EMOTION CONTEXT FROM CAMERA
-     if detected_emotion:
-        emotion_context = f"The user may currently appear {detected_emotion}."
-     else:
-        emotion_context = ""
-
-    # 🔮 BUILD PROMPT WITH EMOTION CONTEXT
-        prompt = f"""
-     {SYSTEM_PROMPT}
-
-     Emotion context (optional):
-     {emotion_context}
+        # 🎥 OPTIONAL EMOTION CONTEXT FROM CAMERA
+        detected_emotion = st.session_state.get("detected_emotion")
+        if detected_emotion:
+            emotion_context = f"The user may currently appear {detected_emotion}."
+        else:
+            emotion_context = ""
 
-     Conversation memory:
-     {st.session_state.memory}
+        # Whatever summary the background worker has finished so far; read
+        # here because a Send reruns only this fragment
+        st.session_state.memory = st.session_state.memory_worker.memory
 
-     User: {user_input}
-     Assistant:
-     """
+        # 🔮 BUILD PROMPT WITH EMOTION CONTEXT
+        prompt = build_prompt(
+            SYSTEM_PROMPT, emotion_context, st.session_state.memory,
+            recent, user_input, PROMPT_TOKEN_BUDGET
+        )
 
-        response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}]
+        # Topic check and a speculative reply start together;
+        # the reply is only shown if the topic check comes back MENTAL.
+        turn = ChatTurn(
+            get_llm(USER), MODEL_NAME, user_input, prompt,
+            classifier=get_topic_classifier(), threshold=TOPIC_CONFIDENCE,
+            cache=get_response_cache()
         )
 
+        check = turn.topic()
+        if turn.check_error is not None:
+            st.warning(f"Topic check failed, proceeding: {turn.check_error}")
 
-        # Topic Check (reuse existing prompt style)
-        check_prompt = f"""
-Classify the topic of this message:
-
-"{user_input}"
-
-If the message expresses or discusses:
-• feelings
-• emotions
-• mood
-• joy
-• sadness
-• anxiety
-• stress
-• motivation
-• love
-• loneliness
-• self-worth
-• relationships
-• personal reflection
-• mental state
-
-→ Reply: MENTAL
-
-If the message is about:
-• programming
-• math/homework
-• politics/news
-• finance
-• medical or health diagnosis
-• sexual instruction or adult content
-• illegal activity
-• factual/encyclopedic questions
-→ Reply: OTHER
-"""
-        try:
-            check = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[{"role": "user", "content": check_prompt}]
-            ).choices[0].message.content.strip()
-        except Exception as e:
-            check = "MENTAL"  # fallback to allow conversation
-            st.warning(f"Topic check failed, proceeding: {e}")
-
-        if check != "MENTAL":
-            reply = "I'm here only to help with emotional and mental well-being. If you want to share your feelings, I'm here with you. 💛"
-        else:
-            prompt = f"{SYSTEM_PROMPT}\n\nMemory:\n{st.session_state.memory}\n\nUser: {user_input}\nAssistant:"
-            try:
-                reply = client.chat.completions.create(
-                    model=MODEL_NAME,
-                    messages=[{"role": "user", "content": prompt}]
-                ).choices[0].message.content.strip()
-            except Exception as e:
-                reply = "Sorry, I couldn't reach the assistant right now. Please try again later."
-                st.error(f"Assistant API error: {e}")
+        # Show reply
+        with st.chat_message("assistant"):
+            reply_box = st.empty()
+
+            if check != "MENTAL":
+                reply = REFUSAL_REPLY
+                reply_box.write(reply)
+            else:
+                try:
+                    if stream_mode:
+                        reply = turn.stream_into(reply_box)
+                    else:
+                        reply = turn.reply()
+                        reply_box.write(reply)
+                except Exception as e:
+                    reply = "Sorry, I couldn't reach the assistant right now. Please try again later."
+                    reply_box.write(reply)
+                    st.error(f"Assistant API error: {e}")
+
+            timings = turn.finish()
+            for stage, sec in timings.items():
+                get_metrics().observe(f"chat_{stage}", sec)
+            if METRICS:
+                st.caption(" · ".join(f"{stage} {sec * 1000:.0f} ms" for stage, sec in timings.items()))
 
         st.session_state.history.append({"role": "assistant", "content": reply})
+        # Summarized in the background; the result is used from the next turn on
+        st.session_state.memory_worker.submit(st.session_state.history)
 
-        # Show reply
-        with st.chat_message("assistant"):
-            st.write(reply)
+        server_audio = False
+        if TTS_ENGINE == "local":
+            try:
+                with get_metrics().span("tts"):
+                    audio_path = text_to_speech(reply, tts_lang, cache=get_tts_cache())
+                autoplay_audio(audio_path, autoplay=autoplay)
+                server_audio = True
+            except Exception as e:
+                st.caption(f"Server voice unavailable, using the browser's: {e}")
 
         # Client-side TTS HTML
         escaped_text = json.dumps(reply)
@@ -575,7 +734,7 @@ If the message is about:
           document.getElementById("stop_btn").onclick = () => {{
             window.speechSynthesis.cancel();
           }};
-          const autoplay = {json.dumps(autoplay)};
+          const autoplay = {json.dumps(autoplay and not server_audio)};
           if (autoplay) {{
             try {{
               window.speechSynthesis.cancel();
@@ -589,7 +748,79 @@ If the message is about:
         }})();
         </script>
         """
-        st.components.v1.html(tts_html, height=140)
+        components.html(tts_html, height=140)
+
+    # A send doesn't reach the end of the script, so save here too
+    save_session()
+
+
+@timed_fragment("fragment_journal")
+def journal_form():
+    moods = {"😄 Very Good": 5, "🙂 Good": 4, "😐 Okay": 3, "☹️ Bad": 2, "😢 Very Bad": 1}
+    mood = st.selectbox("Select mood:", list(moods.keys()))
+    note = st.text_area("Anything you want to express? (optional)")
+
+    if st.button("Save"):
+        entry = {"date": datetime.date.today().isoformat(), "mood": moods[mood], "note": note}
+        with get_metrics().span("journal_save"):
+            get_journal_store().append(st.session_state.username, entry)
+        st.success("Saved 💛")
+
+
+# Switching the view or table page reruns only this
+@timed_fragment("fragment_dashboard")
+def dashboard_view():
+    with get_metrics().span("dashboard_aggregate"):
+        agg = get_dashboard_cache().get(get_journal_store(), st.session_state.username)
+    if agg.entries == 0:
+        st.info("No entries yet. Add some from Mood Journal.")
+    else:
+        stat1, stat2, stat3 = st.columns(3)
+        stat1.metric("Entries", agg.entries)
+        stat2.metric("Average mood", f"{agg.overall_mean():.2f}")
+        stat3.metric("Days logged", len(agg.daily))
+
+        view = st.radio("View", ["Daily", "Weekly"], horizontal=True)
+        if view == "Daily":
+            chart = pd.DataFrame({"mood": agg.daily_mean(), "7-day average": agg.rolling_mean(7)})
+        else:
+            chart = pd.DataFrame({"mood": agg.weekly_mean()})
+        st.line_chart(downsample(chart, MAX_CHART_POINTS))
+
+        with get_metrics().span("mood_analytics"):
+            report = analyze(agg)
+        streak = report["streaks"]
+        insight1, insight2, insight3 = st.columns(3)
+        insight1.metric("Current streak", f"{streak['current']} days", help=f"Longest: {streak['longest']} days")
+        insight2.metric("Good-mood streak", f"{streak['good_current']} days",
+                        help=f"Days averaging 4 or more in a row. Longest: {streak['good_longest']} days")
+        volatility = report["volatility"]
+        insight3.metric("Mood variability", "—" if pd.isna(volatility) else f"{volatility:.2f}",
+                        help="Standard deviation across all entries")
+
+        harder = report["alerts"][report["alerts"]["z"] < 0].tail(3)
+        if not harder.empty:
+            days = ", ".join(day.strftime("%b %d, %Y") for day in harder.index)
+            st.info(f"Some days felt harder than the weeks around them: {days}. Be gentle with yourself. 💛")
+
+        st.caption("Average mood by weekday")
+        st.bar_chart(report["weekday"])
+        st.caption(f"Note length per entry, weekly (trend {report['note_slope']:+.1f} characters/week)")
+        st.line_chart(downsample(report["note_length"], MAX_CHART_POINTS))
+
+        pages = -(-agg.entries // TABLE_PAGE_SIZE)
+        page_no = st.number_input("Page (newest first)", min_value=1, max_value=pages, value=1)
+        st.dataframe(agg.page(page_no - 1, TABLE_PAGE_SIZE), use_container_width=True)
+
+
+if page == "💬 Chat":
+    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+    st.subheader("Talk to me")
+
+    st.markdown("### 🎤 Speak Instead of Typing")
+    components.html(VOICE_INPUT_HTML, height=120)
+
+    chat_section()
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -601,19 +832,7 @@ elif page == "📝 Mood Journal":
     st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
     st.subheader("How are you feeling today?")
 
-    moods = {"😄 Very Good": 5, "🙂 Good": 4, "😐 Okay": 3, "☹️ Bad": 2, "😢 Very Bad": 1}
-    mood = st.selectbox("Select mood:", list(moods.keys()))
-    note = st.text_area("Anything you want to express? (optional)")
-
-    if st.button("Save"):
-        entry = {"date": datetime.date.today().isoformat(), "mood": moods[mood], "note": note}
-        try:
-            df = pd.read_csv("journal.csv")
-            df = pd.concat([df, pd.DataFrame([entry])], ignore_index=True)
-        except:
-            df = pd.DataFrame([entry])
-        df.to_csv("journal.csv", index=False)
-        st.success("Saved 💛")
+    journal_form()
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -625,13 +844,7 @@ elif page == "📊 Dashboard":
     st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
     st.subheader("Your Mood Trend")
 
-    try:
-        df = pd.read_csv("journal.csv")
-        df = df.set_index("date")
-        st.line_chart(df["mood"])
-        st.write(df)
-    except:
-        st.info("No entries yet. Add some from Mood Journal.")
+    dashboard_view()
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -656,3 +869,25 @@ elif page == "🧘 Coping Tools":
 1 thing you feel inside  
 """)
     st.markdown("</div>", unsafe_allow_html=True)
+
+
+# At most one write per rerun, and none if nothing changed
+save_session()
+
+rerun = get_metrics().end_rerun(time.perf_counter() - _RERUN_START, page=page)
+
+if METRICS:
+    with st.sidebar.expander("⏱ Timings"):
+        st.caption(f"This rerun: {rerun['rerun_ms']:.0f} ms")
+        if rerun["stages"]:
+            st.dataframe(pd.Series(rerun["stages"], name="ms"), use_container_width=True)
+        st.caption("Since process start")
+        st.dataframe(pd.DataFrame(get_metrics().summary()).T, use_container_width=True)
+        st.download_button("Prometheus", get_metrics().prometheus(), "mindcare_metrics.prom", "text/plain")
+        st.download_button("JSON lines", get_metrics().json_lines(), "mindcare_reruns.jsonl", "application/json")
+
+if DEBUG:
+    with st.sidebar:
+        st.caption(f"Clients: {get_resources().report()}")
+        if vision.is_loaded():
+            st.caption(f"OpenCV loaded in {vision.load()['load_seconds'] * 1000:.0f} ms")
@@ -0,0 +1,66 @@
+# bench/face_detection.py
+# Per-frame camera check latency at several resolutions: the original
+# full-resolution path vs vision's downscaled detection (uncached, and a
+# memo hit through detect_face_and_emotion).
+#
+#   python -m bench.face_detection                 # synthetic frames
+#   python -m bench.face_detection --image me.jpg  # rescale a real photo
+import argparse
+import time
+
+import numpy as np
+
+import vision
+
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720), (1920, 1080), (3840, 2160)]
+
+
+def synthetic_frame(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    frame = (xx * 255 // width + yy * 255 // height) // 2
+    frame = frame + rng.integers(-20, 20, size=(height, width))
+    return np.clip(frame, 0, 255).astype(np.uint8)[..., None].repeat(3, axis=2)
+
+
+def full_resolution(cv2, cascade, image_bytes):
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cascade.detectMultiScale(gray, 1.3, 5)
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the camera face check.")
+    parser.add_argument("--image", help="photo to rescale instead of synthetic frames")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    loaded = vision.load()
+    cv2, cascade = loaded["cv2"], loaded["cascade"]
+    source = cv2.imread(args.image) if args.image else None
+
+    print(f"{'resolution':>11} {'full-res ms':>12} {'tuned ms':>9} {'memo hit ms':>12}")
+    for i, (width, height) in enumerate(RESOLUTIONS):
+        frame = cv2.resize(source, (width, height)) if source is not None else synthetic_frame(width, height, i)
+        image_bytes = cv2.imencode(".jpg", frame)[1].tobytes()
+
+        old = best_of(lambda: full_resolution(cv2, cascade, image_bytes), args.repeat)
+        # _detect_face_and_emotion goes through the frame memo, so time the
+        # uncached analysis underneath it
+        new = best_of(lambda: vision._analyze_frame(image_bytes), args.repeat)
+        vision.detect_face_and_emotion(image_bytes)
+        memo = best_of(lambda: vision.detect_face_and_emotion(image_bytes), args.repeat)
+        print(f"{width:>5}x{height:<5} {old:12.1f} {new:9.1f} {memo:12.3f}")
+
+
+if __name__ == "__main__":
+    main()
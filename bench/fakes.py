@@ -0,0 +1,126 @@
+# bench/fakes.py
+# Local stand-ins for Groq and a gspread Worksheet with configurable latency.
+import re
+import threading
+import time
+from types import SimpleNamespace as NS
+
+from chat_pipeline import CHECK_PROMPT
+
+_CHECK_MARKER = CHECK_PROMPT.strip().splitlines()[0]
+_OTHER_WORDS = re.compile(r"\b(code|python|math|homework|stock|capital|election|solve)\b", re.I)
+
+
+class FakeCompletions:
+    """
+    `latency` is the time to the first token (or the whole reply when not
+    streaming); each further streamed token adds `token_latency`.
+    """
+
+    def __init__(self, latency=0.2, token_latency=0.01, reply_tokens=40):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.reply_tokens = reply_tokens
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        text = messages[-1]["content"]
+        time.sleep(self.latency)
+
+        if _CHECK_MARKER in text:
+            verdict = "OTHER" if _OTHER_WORDS.search(text) else "MENTAL"
+            return NS(choices=[NS(message=NS(content=verdict))])
+
+        words = ["I", "hear", "you."] + ["Take a slow breath."] * (self.reply_tokens // 4)
+        if not stream:
+            time.sleep(self.token_latency * len(words))
+            return NS(choices=[NS(message=NS(content=" ".join(words)))])
+
+        def chunks():
+            for w in words:
+                time.sleep(self.token_latency)
+                yield NS(choices=[NS(delta=NS(content=w + " "))])
+        return chunks()
+
+
+class FakeGroq:
+    def __init__(self, api_key=None, latency=0.2, token_latency=0.01, **kwargs):
+        self.completions = FakeCompletions(latency, token_latency)
+        self.chat = NS(completions=self.completions)
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"APIError: [{status}]: {message}")
+        self.response = NS(status_code=status, headers={})
+
+
+class FakeSheet:
+    """
+    In-memory users worksheet. Every API-backed method sleeps `latency`
+    plus `per_row_latency` for each row it transfers, like the real API.
+    The grid is exactly as tall as the data, so a range starting past the
+    last row fails like it does on a sheet that appends have filled.
+    """
+
+    def __init__(self, rows=(), latency=0.15, per_row_latency=0.00002):
+        self.rows = [["username", "email", "password_hash"]] + [list(r) for r in rows]
+        self.latency = latency
+        self.per_row_latency = per_row_latency
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _api(self, name, rows=0):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        time.sleep(self.latency + rows * self.per_row_latency)
+
+    def get_all_values(self):
+        self._api("get_all_values", len(self.rows))
+        return [list(r) for r in self.rows]
+
+    def get_all_records(self):
+        self._api("get_all_records", len(self.rows))
+        header = self.rows[0]
+        return [dict(zip(header, r)) for r in self.rows[1:]]
+
+    def col_values(self, col):
+        self._api("col_values", len(self.rows))
+        return [r[col - 1] for r in self.rows]
+
+    def get(self, range_name):
+        first, last = re.match(r"[A-Z]+(\d+)(?::[A-Z]+(\d+))?", range_name).groups()
+        if int(first) > len(self.rows):
+            self._api("get")
+            raise FakeAPIError(400, f"Range ('Sheet1'!{range_name}) exceeds grid limits. Max rows: {len(self.rows)}")
+        rows = [list(r) for r in self.rows[int(first) - 1:int(last) if last else None]]
+        self._api("get", len(rows))
+        return rows
+
+    def append_rows(self, rows, **kwargs):
+        self._api("append_rows", len(rows))
+        with self._lock:
+            start = len(self.rows) + 1
+            self.rows.extend(list(r) for r in rows)
+            end = len(self.rows)
+        return {"updates": {"updatedRange": f"Sheet1!A{start}:C{end}"}}
+
+    def append_row(self, row, **kwargs):
+        return self.append_rows([row])
+
+    def update_cell(self, row, col, value):
+        self._api("update_cell")
+        self.rows[row - 1][col - 1] = value
+
+    def batch_update(self, data, **kwargs):
+        self._api("batch_update", len(data))
+        with self._lock:
+            for item in data:
+                col, row = re.match(r"([A-Z]+)(\d+)", item["range"]).groups()
+                col = sum((ord(c) - 64) * 26 ** i for i, c in enumerate(reversed(col)))
+                cells = self.rows[int(row) - 1]
+                cells.extend([""] * (col - len(cells)))
+                cells[col - 1] = item["values"][0][0]
@@ -0,0 +1,334 @@
+# bench/run.py
+# Offline benchmark suite: drives a.py with streamlit's AppTest against the
+# fakes in bench/fakes.py, so no Groq or Google credentials are needed.
+#
+#   python -m bench.run                               # full run -> bench_results.json
+#   python -m bench.run --quick --out new.json --compare bench_results.json
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import groq
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import resources
+import vision
+from bench import fakes
+from bench.face_detection import RESOLUTIONS, synthetic_frame
+from journal_store import JournalStore
+from passwords import PasswordHasher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "a.py")
+
+# AppTest reruns would otherwise print every deprecation warning each time
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+
+def by_label(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(label)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "p50_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        "mean_ms": statistics.fmean(samples),
+    }
+
+
+class Harness:
+    """One fresh app process-state (caches cleared) over the given fakes."""
+
+    def __init__(self, args, sheet=None, secrets=None):
+        self.workdir = tempfile.mkdtemp(prefix="mindcare-bench-")
+        self.sheet = sheet if sheet is not None else fakes.FakeSheet(latency=args.sheet_latency)
+        self.groq = None
+
+        def make_groq(api_key=None, **kwargs):
+            self.groq = fakes.FakeGroq(api_key, latency=args.groq_latency, token_latency=args.token_latency)
+            return self.groq
+
+        groq.Groq = make_groq
+        resources.open_user_sheet = lambda *a, **k: self.sheet
+        st.cache_resource.clear()
+
+        self.at = AppTest.from_file(APP, default_timeout=300)
+        self.at.secrets["GROQ_API_KEY"] = "bench"
+        self.at.secrets["service_account"] = {}
+        self.at.secrets["BCRYPT_ROUNDS"] = args.bcrypt_rounds
+        self.at.secrets["GROQ_RPM"] = 100000
+        self.at.secrets["GROQ_TPM"] = 10 ** 9
+        self.at.secrets["JOURNAL_DIR"] = os.path.join(self.workdir, "journal")
+        self.at.secrets["SIGNUP_SPOOL_PATH"] = os.path.join(self.workdir, "signup_spool.jsonl")
+        for key, value in (secrets or {}).items():
+            self.at.secrets[key] = value
+        self.startup_ms = timed(self.at.run)
+        self._check()
+
+    def _check(self):
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+
+    def run(self, element):
+        ms = timed(element.run)
+        self._check()
+        return ms
+
+
+# ---------- scenarios ----------
+def bench_chat(args):
+    h = Harness(args)
+    messages = [
+        "I feel stressed about work",
+        "hi",
+        "I can't sleep because I keep overthinking",
+        "can you solve my math homework",
+        "I feel lonely lately",
+    ]
+    turns = []
+    for i in range(args.turns):
+        h.at.text_input(key="speech_input").input(f"{messages[i % len(messages)]} ({i})")
+        turns.append(h.run(by_label(h.at.button, "Send").click()))
+    idle = [h.run(h.at) for _ in range(5)]
+    return {
+        "startup_ms": h.startup_ms,
+        "turn": summary(turns),
+        "first_turn_ms": turns[0],
+        "idle_rerun": summary(idle),
+        "groq_calls": h.groq.completions.calls if h.groq else 0,
+    }
+
+
+def bench_auth(args, sizes):
+    stored = PasswordHasher(args.bcrypt_rounds).hash("benchpass")
+    results = {}
+    for n in sizes:
+        sheet = fakes.FakeSheet(
+            [(f"user{i}", f"user{i}@example.com", stored) for i in range(n)],
+            latency=args.sheet_latency
+        )
+        h = Harness(args, sheet=sheet)
+
+        by_label(h.at.sidebar.selectbox, "Choose").select("Login")
+        h.run(h.at)
+        logins = []
+        for i in range(3):
+            by_label(h.at.sidebar.text_input, "Username").input(f"user{(i * 7919) % n}")
+            by_label(h.at.sidebar.text_input, "Password").input("benchpass")
+            logins.append(h.run(by_label(h.at.sidebar.button, "Login").click()))
+            if not h.at.session_state.logged_in:
+                raise RuntimeError(f"benchmark login failed with {n} users")
+            h.run(by_label(h.at.sidebar.button, "Logout").click())
+            by_label(h.at.sidebar.selectbox, "Choose").select("Login")
+            h.run(h.at)
+
+        by_label(h.at.sidebar.selectbox, "Choose").select("Sign Up")
+        h.run(h.at)
+        signups = []
+        for i in range(3):
+            by_label(h.at.sidebar.text_input, "Create Username").input(f"newuser{i}")
+            by_label(h.at.sidebar.text_input, "Email").input(f"new{i}@example.com")
+            by_label(h.at.sidebar.text_input, "Password").input("benchpass")
+            signups.append(h.run(by_label(h.at.sidebar.button, "Sign Up").click()))
+
+        results[str(n)] = {
+            "first_login_ms": logins[0],
+            "warm_login": summary(logins[1:]),
+            "signup": summary(signups),
+            "sheet_calls": dict(sheet.calls),
+        }
+    return results
+
+
+def bench_journal(args, sizes):
+    results = {}
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        h_args_dir = tempfile.mkdtemp(prefix="mindcare-journal-")
+        store = JournalStore(h_args_dir, legacy_path=None)
+        dates = pd.date_range("2000-01-01", periods=n, freq="6h").strftime("%Y-%m-%d")
+        pd.DataFrame({"date": dates, "mood": rng.integers(1, 6, n), "note": "bench entry"}).to_csv(
+            store.path(None), index=False
+        )
+
+        h = Harness(args, secrets={"JOURNAL_DIR": h_args_dir})
+        by_label(h.at.sidebar.radio, "Navigate").set_value("📊 Dashboard")
+        dashboard_cold = h.run(h.at)
+        dashboard_warm = [h.run(h.at) for _ in range(3)]
+
+        by_label(h.at.sidebar.radio, "Navigate").set_value("📝 Mood Journal")
+        h.run(h.at)
+        saves = [h.run(by_label(h.at.button, "Save").click()) for _ in range(3)]
+
+        by_label(h.at.sidebar.radio, "Navigate").set_value("📊 Dashboard")
+        dashboard_after_save = h.run(h.at)
+
+        results[str(n)] = {
+            "save": summary(saves),
+            "dashboard_cold_ms": dashboard_cold,
+            "dashboard_warm": summary(dashboard_warm),
+            "dashboard_after_save_ms": dashboard_after_save,
+        }
+    return results
+
+
+def bench_interactions(args):
+    """
+    Rerun cost of common widget clicks. AppTest always reruns the whole
+    script, so next to that this reports the time spent in the section's
+    own fragment (its "fragment_*" span), which is what a click costs
+    when Streamlit reruns just that fragment.
+    """
+    records_path = os.path.join(tempfile.mkdtemp(prefix="mindcare-metrics-"), "reruns.jsonl")
+    h = Harness(args, secrets={"METRICS": True, "METRICS_JSONL": records_path})
+
+    def last_stage(stage):
+        with open(records_path) as f:
+            return json.loads(f.readlines()[-1])["stages"].get(stage)
+
+    interactions = {
+        "menu_toggle": ("fragment_menu", lambda i: by_label(h.at.button, "☰").click()),
+        "tts_language": ("fragment_chat", lambda i: by_label(h.at.selectbox, "TTS language").select(
+            ["en-US", "en-IN"][i % 2])),
+        "camera_toggle": ("fragment_camera", lambda i: by_label(
+            h.at.checkbox, "Enable camera-based emotion check").set_value(i % 2 == 0)),
+        "account_choice": ("fragment_account", lambda i: by_label(h.at.sidebar.selectbox, "Choose").select(
+            ["Login", "Continue as Guest"][i % 2])),
+    }
+    results = {}
+    for name, (stage, act) in interactions.items():
+        full, fragment = [], []
+        for i in range(args.repeat):
+            full.append(h.run(act(i)))
+            ms = last_stage(stage)
+            if ms is not None:
+                fragment.append(ms)
+        results[name] = {"full_rerun": summary(full)}
+        if fragment:
+            results[name]["fragment"] = summary(fragment)
+    return results
+
+
+def bench_camera(args):
+    vision.load()
+    results = {}
+    for i, (width, height) in enumerate(RESOLUTIONS):
+        frame = synthetic_frame(width, height, i)
+        image_bytes = vision.load()["cv2"].imencode(".jpg", frame)[1].tobytes()
+        # _analyze_frame bypasses the memo: decode + detect + brightness every time
+        detect = [timed(lambda: vision._analyze_frame(image_bytes)) for _ in range(args.repeat)]
+        vision.detect_face_and_emotion(image_bytes)
+        memo = [timed(lambda: vision.detect_face_and_emotion(image_bytes)) for _ in range(args.repeat)]
+        results[f"{width}x{height}"] = {"detect": summary(detect), "memo_hit": summary(memo)}
+    return results
+
+
+# ---------- output ----------
+def flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old, new):
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    print(f"\n{'metric':60s} {'old':>10s} {'new':>10s} {'change':>8s}")
+    for name in sorted(new_flat):
+        if not name.endswith("_ms") or name not in old_flat:
+            continue
+        before, after = old_flat[name], new_flat[name]
+        change = (after - before) / before * 100 if before else float("nan")
+        flag = "  <-- slower" if change > 10 else ""
+        print(f"{name:60s} {before:10.1f} {after:10.1f} {change:+7.1f}%{flag}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks for the MindCare app.")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes for a fast smoke run")
+    parser.add_argument("--only", nargs="*", choices=["chat", "auth", "journal", "interactions", "camera"])
+    parser.add_argument("--groq-latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--token-latency", type=float, default=0.005)
+    parser.add_argument("--sheet-latency", type=float, default=0.15, help="seconds per Sheets API call")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    user_sizes = [100, 1000] if args.quick else [100, 1000, 10000]
+    journal_sizes = [100, 1000] if args.quick else [100, 1000, 10000, 100000]
+    if args.quick:
+        args.turns = min(args.turns, 4)
+
+    scenarios = {
+        "chat": lambda: bench_chat(args),
+        "auth": lambda: bench_auth(args, user_sizes),
+        "journal": lambda: bench_journal(args, journal_sizes),
+        "interactions": lambda: bench_interactions(args),
+        "camera": lambda: bench_camera(args),
+    }
+    results = {}
+    for name, run in scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        print(f"running {name} ...", file=sys.stderr)
+        results[name] = run()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
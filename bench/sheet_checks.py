@@ -0,0 +1,119 @@
+# bench/sheet_checks.py
+# Correctness checks of the Sheets code paths against FakeSheet: the
+# interleavings between processes that the timing benchmarks don't cover.
+#
+#   python -m bench.sheet_checks
+import os
+import sys
+import tempfile
+import time
+import traceback
+
+from bench.fakes import FakeAPIError, FakeSheet
+from sheet_writer import WriteBehindAppender
+from user_store import SheetsUserStore
+
+
+def check_foreign_rows_stay_visible():
+    # Another process appends "bob" after this one built its index; this
+    # process then registers "carol" (within the miss-refresh interval, so
+    # without a top-up), which lands after bob
+    sheet = FakeSheet([["alice", "a@x", "h-alice"]], latency=0)
+    store = SheetsUserStore(sheet)
+    assert store.get_password_hash("alice") == "h-alice"
+    sheet.append_rows([["bob", "b@x", "h-bob"]])
+    assert store.add_user("carol", "c@x", "h-carol")
+
+    store.index.miss_refresh_interval = 0
+    assert store.get_password_hash("bob") == "h-bob"
+    assert not store.add_user("bob", "evil@x", "h-evil")
+    assert [r[0] for r in sheet.rows[1:]] == ["alice", "bob", "carol"]
+    assert store.get_password_hash("carol") == "h-carol"
+
+
+def check_rehash_follows_moved_rows():
+    # "alice" is deleted from the sheet after this process indexed it, so
+    # bob moves up into alice's cached row
+    sheet = FakeSheet([["alice", "a@x", "h-alice"], ["bob", "b@x", "h-bob"]], latency=0)
+    store = SheetsUserStore(sheet)
+    assert store.get_password_hash("alice") == "h-alice"
+    del sheet.rows[1]
+
+    store.update_password_hash("alice", "h-alice-2")
+    assert sheet.rows[1] == ["bob", "b@x", "h-bob"]
+    store.update_password_hash("bob", "h-bob-2")
+    assert sheet.rows[1] == ["bob", "b@x", "h-bob-2"]
+
+
+def check_write_behind_retry_after_landed_append():
+    # append_rows writes the batch, then the API answers 503
+    sheet = FakeSheet(latency=0)
+    append_rows, calls = sheet.append_rows, []
+
+    def flaky(rows, **kwargs):
+        calls.append(len(rows))
+        response = append_rows(rows, **kwargs)
+        if len(calls) == 1:
+            raise FakeAPIError(503, "backend error")
+        return response
+
+    sheet.append_rows = flaky
+    spool = os.path.join(tempfile.mkdtemp(), "spool.jsonl")
+    store = SheetsUserStore(sheet, spool_path=spool, flush_interval=0.01)
+    store.writer.max_backoff = 0.05
+    assert store.add_user("dave", "d@x", "h-dave")
+    deadline = time.monotonic() + 5
+    while store.writer.stats()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    store.writer.close()
+
+    assert [r[0] for r in sheet.rows[1:]] == ["dave"]
+    assert store.get_password_hash("dave") == "h-dave"
+
+
+def check_spools_are_per_process():
+    # Two workers share SIGNUP_SPOOL_PATH while the sheet is down; one dies
+    sheet = FakeSheet(latency=0)
+
+    def down(rows, **kwargs):
+        raise FakeAPIError(503, "backend error")
+
+    sheet.append_rows = down
+    base = os.path.join(tempfile.mkdtemp(), "signup_spool.jsonl")
+    live = WriteBehindAppender(sheet, base, flush_interval=60)
+    dead = WriteBehindAppender(sheet, base, flush_interval=60)
+    live.append(["ann", "", "h-ann"])
+    dead.append(["dan", "", "h-dan"])
+    os.close(dead._spool_lock)  # what the kernel does when the process dies
+    dead._spool_lock = None
+    live.append(["amy", "", "h-amy"])
+
+    fresh = WriteBehindAppender(FakeSheet(latency=0), base, flush_interval=60)
+    assert fresh.pending("dan") and not fresh.pending("ann")
+    with open(live.spool_path) as f:
+        assert len(f.readlines()) == 2
+
+
+CHECKS = [
+    check_foreign_rows_stay_visible,
+    check_rehash_follows_moved_rows,
+    check_write_behind_retry_after_landed_append,
+    check_spools_are_per_process,
+]
+
+
+def main():
+    failed = 0
+    for check in CHECKS:
+        try:
+            check()
+            print(f"ok    {check.__name__}")
+        except Exception:
+            failed += 1
+            print(f"FAIL  {check.__name__}")
+            traceback.print_exc()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# bench/vision_import.py
+# Cold-start cost of the vision stack, each case in a fresh interpreter.
+#
+#   python -m bench.vision_import
+import json
+import subprocess
+import sys
+
+APP_IMPORTS = "import streamlit, pandas, groq, bcrypt, numpy"
+
+CASES = {
+    "app without vision": APP_IMPORTS,
+    "app + import vision (lazy)": APP_IMPORTS + "; import vision",
+    "app + vision.load()": APP_IMPORTS + "; import vision; vision.load()",
+}
+
+PROBE = """
+import json, resource, time
+start = time.perf_counter()
+exec({code!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def measure(code, repeat=3):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(code=code)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    return min(runs, key=lambda r: r["seconds"])
+
+
+def main():
+    results = {name: measure(code) for name, code in CASES.items()}
+    base = results["app without vision"]
+    for name, r in results.items():
+        print(f"{name:30s} {r['seconds'] * 1000:7.0f} ms  {r['max_rss_mb']:6.1f} MB  "
+              f"(+{(r['seconds'] - base['seconds']) * 1000:.0f} ms, +{r['max_rss_mb'] - base['max_rss_mb']:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# bulk_users.py
+# Bulk import of accounts from CSV into the mindcare_users sheet, and
+# bulk export of the sheet to CSV.
+#
+#   python bulk_users.py import partners.csv --rounds 12
+#   python bulk_users.py import partners.csv --update       # also reset existing users
+#   python bulk_users.py export users.csv --page-size 2000
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from migrate_users import load_service_account
+from passwords import MIN_ROUNDS, calibrate
+from sheet_writer import _retry_after, split_written
+from user_index import past_last_row
+from user_store import SHEET_NAME, open_user_sheet
+
+DEFAULT_HEADER = ["username", "email", "password_hash"]
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _hash(job):
+    # Runs in a worker process, so it must be a top-level function
+    password, rounds = job
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+
+def _column(index):
+    """0-based column index -> A1 letters."""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def with_retry(fn, *args, retries=6, max_backoff=60.0, before_retry=None):
+    """
+    Calls `fn(*args)`, retrying quota (429) and server errors with
+    exponential backoff, or after Retry-After when the API sends one.
+    `before_retry()` runs after each wait, before the next attempt.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status not in RETRY_STATUS or attempt == retries:
+                raise
+            time.sleep(_retry_after(e) or min(2 ** attempt, max_backoff))
+            if before_retry is not None:
+                before_retry()
+
+
+def read_users(path):
+    """
+    Reads username,email,password rows. Blank usernames or passwords and
+    repeats of a username already seen in the file are skipped.
+    Returns: (list of (username, email, password), skipped count)
+    """
+    users, seen, skipped = [], set(), 0
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for record in csv.DictReader(f):
+            username = (record.get("username") or "").strip()
+            password = record.get("password") or ""
+            if not username or not password or username in seen:
+                skipped += 1
+                continue
+            seen.add(username)
+            users.append((username, (record.get("email") or "").strip(), password))
+    return users, skipped
+
+
+# ---------- resume state ----------
+def input_digest(users, rounds):
+    """One digest of the whole import, so nothing is derived from a single password."""
+    return hashlib.sha256(json.dumps([rounds, users]).encode()).hexdigest()
+
+
+class HashState:
+    """
+    Hashes computed so far, appended to a JSON-lines file as they arrive
+    so a rerun after a failure doesn't pay for them again. The file holds
+    only usernames and bcrypt hashes, under a first line naming the
+    `digest` of the input they were computed from; if the input has
+    changed since, the file is started over instead of reused.
+    """
+
+    def __init__(self, path, digest):
+        self.path = path
+        self.hashes = {}
+        lines = []
+        if os.path.exists(path):
+            with open(path) as f:
+                lines = f.readlines()
+        if lines and lines[0].strip() == json.dumps({"input": digest}):
+            for line in lines[1:]:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash
+                self.hashes[item["username"]] = item["hash"]
+            mode = os.O_APPEND
+        else:
+            mode = os.O_TRUNC
+        # Only the owner may read the hashes
+        self._file = os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | mode, 0o600), "w")
+        if mode == os.O_TRUNC:
+            self._write({"input": digest})
+
+    def _write(self, item):
+        self._file.write(json.dumps(item) + "\n")
+        self._file.flush()
+
+    def get(self, username):
+        return self.hashes.get(username)
+
+    def add(self, username, password_hash):
+        self._write({"username": username, "hash": password_hash})
+
+    def close(self, remove=False):
+        self._file.close()
+        if remove:
+            os.remove(self.path)
+
+
+# ---------- import ----------
+def import_users(sheet, users, rounds=12, update=False, batch_size=500, workers=None, state_path=None,
+                 log=print):
+    """
+    Adds `users` ((username, email, password) tuples) to the sheet.
+
+    Existing usernames come from one col_values snapshot instead of a
+    lookup per user. Passwords are hashed on a process pool and written
+    in batches as the hashes arrive: new users with append_rows, and
+    with `update`, existing users' email and hash with batch_update.
+    If a write fails for good the exception propagates; running the same
+    import again resumes it, since the fresh snapshot skips rows that
+    were written and `state_path` holds the hashes already computed for
+    the same users.
+    Returns: dict of counts and timings
+    """
+    # Same floor as the app: bulk-imported accounts are never weaker
+    rounds = max(rounds, MIN_ROUNDS)
+    start = time.perf_counter()
+    header = (with_retry(sheet.get, "A1:Z1") or [[]])[0] or DEFAULT_HEADER
+    user_col, email_col, hash_col = (header.index(c) for c in ("username", "email", "password_hash"))
+    existing = {
+        name: row for row, name in enumerate(with_retry(sheet.col_values, user_col + 1), start=1)
+        if row > 1 and name
+    }
+
+    todo = [u for u in users if u[0] not in existing or update]
+    stats = {"users": len(users), "existing": len(users) - len(todo), "added": 0, "updated": 0,
+             "hashed": 0, "reused_hashes": 0}
+
+    state = HashState(state_path, input_digest(users, rounds)) if state_path else None
+    cached = [state.get(name) if state else None for name, _, _ in todo]
+    stats["reused_hashes"] = sum(h is not None for h in cached)
+    jobs = [(password, rounds) for (_, _, password), h in zip(todo, cached) if h is None]
+
+    appends, updates = [], []
+
+    def append(rows):
+        def send():
+            if rows:
+                sheet.append_rows(rows)
+
+        def drop_written():
+            # A 5xx can come back after the rows landed
+            rows[:] = with_retry(split_written, sheet, rows, user_col)[0]
+
+        with_retry(send, before_retry=drop_written)
+
+    def flush(force=False):
+        if appends and (force or len(appends) >= batch_size):
+            append(list(appends))
+            stats["added"] += len(appends)
+            appends.clear()
+        elif updates and (force or len(updates) >= batch_size):
+            ranges = []
+            for row, email, password_hash in updates:
+                ranges.append({"range": f"{_column(email_col)}{row}", "values": [[email]]})
+                ranges.append({"range": f"{_column(hash_col)}{row}", "values": [[password_hash]]})
+            with_retry(sheet.batch_update, ranges)
+            stats["updated"] += len(updates)
+            updates.clear()
+        else:
+            return
+        if log:
+            log(f"  {stats['added']} added, {stats['updated']} updated")
+
+    hash_start = time.perf_counter()
+    workers = workers or os.cpu_count() or 2
+    pool = ProcessPoolExecutor(max_workers=workers)
+    fresh = pool.map(_hash, jobs, chunksize=max(1, min(64, len(jobs) // (workers * 4))))
+    done = False
+    try:
+        for (username, email, password), password_hash in zip(todo, cached):
+            if password_hash is None:
+                password_hash = next(fresh)
+                stats["hashed"] += 1
+                if state:
+                    state.add(username, password_hash)
+            if username in existing:
+                updates.append((existing[username], email, password_hash))
+            else:
+                row = [""] * len(header)
+                row[user_col], row[email_col], row[hash_col] = username, email, password_hash
+                appends.append(row)
+            flush()
+        while appends or updates:
+            flush(force=True)
+        done = True
+    finally:
+        # On failure, don't wait for hashes nobody will write
+        pool.shutdown(cancel_futures=not done)
+        if state:
+            state.close(remove=done)
+    stats["hash_seconds"] = time.perf_counter() - hash_start
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+# ---------- export ----------
+def export_users(sheet, out, page_size=1000, with_hashes=False):
+    """
+    Writes the sheet to the CSV file object `out`, `page_size` rows per
+    request, so neither side ever holds the whole sheet. Password hashes
+    are left out unless `with_hashes`.
+    Returns: number of users written
+    """
+    header = (with_retry(sheet.get, "A1:Z1") or [[]])[0] or DEFAULT_HEADER
+    keep = [i for i, name in enumerate(header) if with_hashes or name != "password_hash"]
+    user_col = header.index("username")
+    writer = csv.writer(out)
+    writer.writerow([header[i] for i in keep])
+
+    written, first = 0, 2
+    while True:
+        # The API drops trailing blank rows, so only an empty page, or one
+        # starting past the end of the grid, marks the end
+        try:
+            rows = with_retry(sheet.get, f"A{first}:Z{first + page_size - 1}")
+        except Exception as e:
+            if not past_last_row(e):
+                raise
+            break
+        if not rows:
+            break
+        for row in rows:
+            if len(row) > user_col and row[user_col]:
+                writer.writerow([row[i] if i < len(row) else "" for i in keep])
+                written += 1
+        first += page_size
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import/export of the users sheet.")
+    parser.add_argument("--sheet", default=SHEET_NAME)
+    parser.add_argument("--credentials", help="service account JSON (default: st.secrets)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="add users from a username,email,password CSV")
+    importer.add_argument("csv")
+    importer.add_argument("--rounds", type=int, help=f"bcrypt cost, at least {MIN_ROUNDS} (default: calibrated like the app)")
+    importer.add_argument("--target-ms", type=float, default=250)
+    importer.add_argument("--update", action="store_true", help="reset email and password of existing users")
+    importer.add_argument("--batch-size", type=int, default=500)
+    importer.add_argument("--workers", type=int, default=None)
+    importer.add_argument("--state", help="resume file for computed hashes (default: <csv>.hashes.jsonl)")
+
+    exporter = commands.add_parser("export", help="write all users to a CSV")
+    exporter.add_argument("csv")
+    exporter.add_argument("--page-size", type=int, default=1000)
+    exporter.add_argument("--with-hashes", action="store_true", help="include password hashes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sheet = open_user_sheet(load_service_account(args.credentials), args.sheet)
+
+    if args.command == "export":
+        with open(args.csv, "w", newline="", encoding="utf-8") as out:
+            written = export_users(sheet, out, args.page_size, args.with_hashes)
+        print(f"wrote {written} users to {args.csv} in {time.perf_counter() - start:.2f}s")
+        return
+
+    users, invalid = read_users(args.csv)
+    rounds = max(args.rounds or calibrate(args.target_ms / 1000), MIN_ROUNDS)
+    print(f"read {len(users)} users ({invalid} blank or duplicate rows skipped), hashing at {rounds} rounds")
+    try:
+        stats = import_users(
+            sheet, users, rounds, args.update, args.batch_size, args.workers,
+            args.state or args.csv + ".hashes.jsonl"
+        )
+    except Exception as e:
+        sys.exit(f"import stopped: {e!r}\nrun the same command again to resume")
+    print(f"{stats['added']} added, {stats['updated']} updated, {stats['existing']} already existed; "
+          f"{stats['hashed']} hashed ({stats['reused_hashes']} reused) in {stats['hash_seconds']:.2f}s, "
+          f"total {stats['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# chat_history.py
+# Bounded per-session chat history and token-budgeted prompt context.
+import json
+import zlib
+from collections import deque
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    """Rough count for English text; good enough for budgeting, no tokenizer needed."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ChatHistory:
+    """
+    The newest `capacity` messages sit in a ring buffer as plain dicts.
+    Anything older is archived in zlib-compressed JSON chunks of
+    `chunk_size` messages, decompressed only when someone scrolls back.
+    """
+
+    def __init__(self, messages=(), capacity=40, chunk_size=50):
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        self.recent = deque(maxlen=capacity)
+        self._chunks = []       # compressed lists of messages
+        self._spill = []        # archived, not yet a full chunk
+        self._archived = 0
+        for m in messages:
+            self.append(m)
+
+    def append(self, message):
+        if len(self.recent) == self.capacity:
+            self._spill.append(self.recent[0])
+            self._archived += 1
+            if len(self._spill) == self.chunk_size:
+                self._chunks.append(zlib.compress(json.dumps(self._spill).encode()))
+                self._spill = []
+        self.recent.append(message)
+
+    def __len__(self):
+        return self._archived + len(self.recent)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def tail(self, count):
+        """The last `count` messages, oldest first."""
+        if count <= 0:
+            return []
+        if count <= len(self.recent):
+            return list(self.recent)[-count:]
+        needed = count - len(self.recent)
+        older = list(self._spill)
+        for chunk in reversed(self._chunks):
+            if len(older) >= needed:
+                break
+            older = json.loads(zlib.decompress(chunk)) + older
+        return older[-needed:] + list(self.recent)
+
+    def to_list(self):
+        return self.tail(len(self))
+
+    def dumps(self):
+        """
+        Compact bytes for storage. Archived chunks are copied as they are,
+        only the uncompressed part is compressed again.
+        """
+        tail = zlib.compress(json.dumps([self._spill, list(self.recent)]).encode())
+        header = json.dumps({
+            "capacity": self.capacity,
+            "chunk_size": self.chunk_size,
+            "archived": self._archived,
+            "sizes": [len(c) for c in self._chunks],
+        }).encode()
+        return len(header).to_bytes(4, "big") + header + b"".join(self._chunks) + tail
+
+    @classmethod
+    def loads(cls, data):
+        size = int.from_bytes(data[:4], "big")
+        header = json.loads(data[4:4 + size])
+        history = cls(capacity=header["capacity"], chunk_size=header["chunk_size"])
+        offset = 4 + size
+        for n in header["sizes"]:
+            history._chunks.append(data[offset:offset + n])
+            offset += n
+        history._spill, recent = json.loads(zlib.decompress(data[offset:]))
+        history.recent.extend(recent)
+        history._archived = header["archived"]
+        return history
+
+
+def context_within_budget(messages, budget_tokens):
+    """
+    Newest-first walk over `messages`, keeping as many as fit.
+    Returns: "role: content" lines, oldest first
+    """
+    lines = []
+    used = 0
+    for m in reversed(messages):
+        line = f"{m['role']}: {m['content']}"
+        cost = estimate_tokens(line) + MESSAGE_OVERHEAD_TOKENS
+        if used + cost > budget_tokens:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(reversed(lines))
+
+
+def build_prompt(system_prompt, emotion_context, memory, messages, user_input, budget_tokens):
+    """
+    Prompt with as much of `messages` as fits in `budget_tokens` after the
+    fixed parts. `messages` should not include `user_input` yet.
+    """
+    head = f"{system_prompt}\n\nEmotion context (optional):\n{emotion_context}\n\nMemory:\n{memory}\n\n"
+    tail = f"User: {user_input}\nAssistant:"
+    remaining = budget_tokens - estimate_tokens(head) - estimate_tokens(tail)
+    context = context_within_budget(messages, remaining)
+    if context:
+        head += f"Recent conversation:\n{context}\n\n"
+    return head + tail
@@ -0,0 +1,206 @@
+# chat_pipeline.py
+# One chat turn = topic check + reply, run concurrently.
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+REFUSAL_REPLY = "I'm here only to help with emotional and mental well-being. If you want to share your feelings, I'm here with you. 💛"
+
+CHECK_PROMPT = """
+Classify the topic of this message:
+
+"{user_input}"
+
+If the message expresses or discusses:
+• feelings
+• emotions
+• mood
+• joy
+• sadness
+• anxiety
+• stress
+• motivation
+• love
+• loneliness
+• self-worth
+• relationships
+• personal reflection
+• mental state
+
+→ Reply: MENTAL
+
+If the message is about:
+• programming
+• math/homework
+• politics/news
+• finance
+• medical or health diagnosis
+• sexual instruction or adult content
+• illegal activity
+• factual/encyclopedic questions
+→ Reply: OTHER
+"""
+
+# Shared across sessions; each turn uses at most two workers.
+_POOL = ThreadPoolExecutor(max_workers=12, thread_name_prefix="chat-turn")
+
+_DONE = object()
+
+
+def classify_topic(client, model, user_input):
+    return client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": CHECK_PROMPT.format(user_input=user_input)}]
+    ).choices[0].message.content.strip()
+
+
+def complete(client, model, prompt):
+    return client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}]
+    ).choices[0].message.content.strip()
+
+
+class ChatTurn:
+    """
+    Starts the topic check and the speculative reply at once. The reply
+    is streamed into a queue by a worker thread and thrown away if the
+    topic check says OTHER.
+
+    A verdict from `cache` (a ResponseCache) or, failing that, a local
+    `classifier` MENTAL verdict at or above `threshold` skips the LLM topic
+    check; a cached OTHER skips the reply as well. A local OTHER is always
+    checked by the LLM: naive Bayes confidence isn't calibrated, and a
+    wrong refusal can turn away someone in crisis. LLM verdicts are
+    written back to the cache.
+    """
+
+    def __init__(self, client, model, user_input, prompt, classifier=None, threshold=0.99, cache=None):
+        self.client = client
+        self.model = model
+        self.prompt = prompt
+        self.user_input = user_input
+        self.cache = cache
+        self.timings = {}
+        self.check_error = None
+        self.reply_error = None
+
+        self._start = time.perf_counter()
+        self._chunks = queue.Queue()
+        self._cancel = threading.Event()
+
+        self.local_verdict = None
+        self.verdict_source = "llm"
+        if cache is not None:
+            self.local_verdict = cache.get_verdict(user_input)
+            if self.local_verdict is not None:
+                self.verdict_source = "cache"
+        if self.local_verdict is None and classifier is not None:
+            t0 = time.perf_counter()
+            label, confidence = classifier.predict(user_input)
+            self.timings["topic_check_local"] = time.perf_counter() - t0
+            if label == "MENTAL" and confidence >= threshold:
+                self.local_verdict = label
+                self.verdict_source = "classifier"
+
+        if self.local_verdict is not None:
+            self._check = Future()
+            self._check.set_result(self.local_verdict)
+        else:
+            self._check = _POOL.submit(self._timed, "topic_check", classify_topic, client, model, user_input)
+
+        if self.local_verdict == "OTHER":
+            self._chunks.put(_DONE)
+        else:
+            _POOL.submit(self._produce)
+
+    def _timed(self, stage, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.timings[stage] = time.perf_counter() - t0
+
+    def _produce(self):
+        t0 = time.perf_counter()
+        stream = None
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": self.prompt}],
+                stream=True
+            )
+            for chunk in stream:
+                if self._cancel.is_set():
+                    break
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if "first_token" not in self.timings:
+                        self.timings["first_token"] = time.perf_counter() - t0
+                    self._chunks.put(delta)
+        except Exception as e:
+            self.reply_error = e
+        finally:
+            # Stop generating (and free the request slot) as soon as we're done
+            if hasattr(stream, "close"):
+                stream.close()
+            self.timings["speculative_reply"] = time.perf_counter() - t0
+            self._chunks.put(_DONE)
+
+    def topic(self):
+        """
+        Wait for the topic check.
+        Returns: "MENTAL" or "OTHER" (MENTAL if the check failed)
+        """
+        try:
+            check = self._check.result()
+            if self.cache is not None and self.verdict_source == "llm":
+                self.cache.put_verdict(self.user_input, check)
+        except Exception as e:
+            self.check_error = e
+            check = "MENTAL"  # fallback to allow conversation
+
+        if check != "MENTAL":
+            self._cancel.set()
+        return check
+
+    def stream_into(self, placeholder):
+        """
+        Render the speculative reply into `placeholder` as it arrives,
+        falling back to a blocking completion if the stream errored.
+        Returns: reply text
+        """
+        parts = []
+        while True:
+            delta = self._chunks.get()
+            if delta is _DONE:
+                break
+            parts.append(delta)
+            placeholder.markdown("".join(parts) + "▌")
+
+        if self.reply_error is not None:
+            t0 = time.perf_counter()
+            reply = complete(self.client, self.model, self.prompt)
+            self.timings["fallback_reply"] = time.perf_counter() - t0
+        else:
+            reply = "".join(parts).strip()
+
+        placeholder.markdown(reply)
+        return reply
+
+    def reply(self):
+        """Blocking variant of stream_into for callers that don't render."""
+        parts = []
+        while True:
+            delta = self._chunks.get()
+            if delta is _DONE:
+                break
+            parts.append(delta)
+        if self.reply_error is not None:
+            return complete(self.client, self.model, self.prompt)
+        return "".join(parts).strip()
+
+    def finish(self):
+        self.timings["total"] = time.perf_counter() - self._start
+        return dict(self.timings)
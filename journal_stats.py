@@ -0,0 +1,132 @@
+# journal_stats.py
+# Incrementally maintained mood aggregates for the dashboard.
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from journal_store import COLUMNS
+from mood_analytics import weekly_totals
+
+
+def downsample(series, max_points):
+    """Average consecutive points so at most `max_points` remain."""
+    if len(series) <= max_points:
+        return series
+    step = -(-len(series) // max_points)
+    buckets = np.arange(len(series)) // step
+    out = series.groupby(buckets).mean()
+    out.index = series.index[::step]
+    return out
+
+
+class JournalAggregate:
+    """
+    Per-day mood sums, counts, sums of squares and note lengths for one
+    journal, advanced by reading only the bytes appended since the last
+    update. Derived series (daily/weekly means, rolling average, the
+    analytics in mood_analytics) are cached until new entries arrive.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.entries = 0
+        self.daily = pd.DataFrame(
+            {"sum": [], "count": [], "sumsq": [], "note_chars": []}, index=pd.DatetimeIndex([], name="date")
+        )
+        self._chunks = []
+        self._rows = None
+        self._derived = {}
+
+    def update(self, store, username):
+        size = store.size(username)
+        if size < self.offset:
+            # Journal was replaced or truncated; start over
+            self._reset()
+        if size == self.offset:
+            return False
+
+        df, self.offset = store.read_since(username, self.offset)
+        if df.empty:
+            return False
+
+        self.entries += len(df)
+        self._chunks.append(df)
+        self._rows = None
+        self._derived = {}
+
+        dates = pd.to_datetime(df["date"], errors="coerce")
+        moods = pd.to_numeric(df["mood"], errors="coerce")
+        valid = dates.notna() & moods.notna()
+        moods = moods[valid]
+        new = pd.DataFrame({
+            "sum": moods,
+            "count": 1,
+            "sumsq": moods * moods,
+            "note_chars": df["note"][valid].fillna("").astype(str).str.len(),
+        }).groupby(dates[valid].values).sum()
+        new.index.name = "date"
+        self.daily = self.daily.add(new, fill_value=0)
+        return True
+
+    def cached(self, key, fn):
+        if key not in self._derived:
+            self._derived[key] = fn()
+        return self._derived[key]
+
+    def daily_mean(self):
+        return self.cached("daily", lambda: self.daily["sum"] / self.daily["count"])
+
+    def weekly_mean(self):
+        def compute():
+            weekly = weekly_totals(self.daily, ["sum"])
+            return weekly["sum"] / weekly["count"]
+        return self.cached("weekly", compute)
+
+    def rolling_mean(self, days=7):
+        def compute():
+            # Weighted by entries, over calendar days rather than rows
+            rolled = self.daily.rolling(f"{days}D").sum()
+            return rolled["sum"] / rolled["count"]
+        return self.cached(("rolling", days), compute)
+
+    def overall_mean(self):
+        count = self.daily["count"].sum()
+        return self.daily["sum"].sum() / count if count else float("nan")
+
+    def rows(self):
+        if self._rows is None:
+            self._rows = pd.concat(self._chunks, ignore_index=True) if self._chunks else pd.DataFrame(columns=COLUMNS)
+            self._chunks = [self._rows]
+        return self._rows
+
+    def page(self, number, size):
+        """Rows for 0-based page `number`, newest first."""
+        rows = self.rows()
+        end = len(rows) - number * size
+        return rows.iloc[max(end - size, 0):max(end, 0)].iloc[::-1]
+
+
+class DashboardCache:
+    """Process-wide JournalAggregate per user, least recently used evicted first."""
+
+    def __init__(self, max_users=256):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._aggregates = OrderedDict()
+
+    def get(self, store, username):
+        key = store.path(username)
+        with self._lock:
+            agg = self._aggregates.pop(key, None) or JournalAggregate()
+            self._aggregates[key] = agg
+            while len(self._aggregates) > self.max_users:
+                self._aggregates.popitem(last=False)
+        with agg.lock:
+            agg.update(store, username)
+        return agg
@@ -0,0 +1,117 @@
+# journal_store.py
+# Append-only, per-user mood journal files.
+import csv
+import io
+import os
+import re
+import zlib
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: rely on O_APPEND alone
+    fcntl = None
+
+COLUMNS = ["date", "mood", "note"]
+# Journal of visitors who aren't logged in. "@" never survives _UNSAFE, so
+# no username maps to this file.
+GUEST_FILE = "@guest.csv"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class _Locked:
+    def __init__(self, fd, exclusive):
+        self.fd = fd
+        if fcntl:
+            self.mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+
+    def __enter__(self):
+        if fcntl:
+            fcntl.flock(self.fd, self.mode)
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+class JournalStore:
+    """
+    One CSV log per user under `root`. Saving an entry is a single locked
+    O_APPEND write of one encoded record, so it costs the same no matter
+    how long the journal is and concurrent sessions never interleave.
+    """
+
+    def __init__(self, root="journal", legacy_path="journal.csv"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._adopt_legacy(legacy_path)
+
+    def _adopt_legacy(self, legacy_path):
+        guest = self.path(None)
+        if os.path.exists(guest):
+            return
+        # Guest entries used to go to guest.csv, which a user named "guest"
+        # shared; before that, the single journal.csv had no users at all
+        for old in (os.path.join(self.root, "guest.csv"), legacy_path):
+            if old and os.path.exists(old):
+                os.replace(old, guest)
+                return
+
+    def path(self, username):
+        if not username:
+            return os.path.join(self.root, GUEST_FILE)
+        name = _UNSAFE.sub("_", username)
+        if name != username:
+            # keep "a b" and "a_b" apart
+            name = f"{name}-{zlib.crc32(username.encode()):08x}"
+        return os.path.join(self.root, f"{name}.csv")
+
+    def append(self, username, entry):
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow([entry.get(c, "") for c in COLUMNS])
+        record = buf.getvalue().encode("utf-8")
+
+        fd = os.open(self.path(username), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            with _Locked(fd, exclusive=True):
+                if os.fstat(fd).st_size == 0:
+                    record = (",".join(COLUMNS) + "\n").encode("utf-8") + record
+                os.write(fd, record)
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def read_since(self, username, offset=0):
+        """
+        Entries appended after byte `offset`.
+        Returns: (DataFrame, new offset) — pass the offset back next time
+        """
+        try:
+            f = open(self.path(username), "rb")
+        except FileNotFoundError:
+            return pd.DataFrame(columns=COLUMNS), 0
+        with f, _Locked(f.fileno(), exclusive=False):
+            f.seek(offset)
+            chunk = f.read()
+        end = offset + len(chunk)
+        if not chunk.strip():
+            return pd.DataFrame(columns=COLUMNS), end
+        df = pd.read_csv(
+            io.BytesIO(chunk),
+            header=0 if offset == 0 else None,
+            names=None if offset == 0 else COLUMNS,
+            keep_default_na=False,
+            dtype={"date": str, "note": str}
+        )
+        return df, end
+
+    def read(self, username):
+        return self.read_since(username, 0)[0]
+
+    def size(self, username):
+        try:
+            return os.path.getsize(self.path(username))
+        except FileNotFoundError:
+            return 0
@@ -0,0 +1,202 @@
+# llm_gateway.py
+# Every Groq completion goes through one process-wide gateway: token-bucket
+# rate limits, a concurrency cap, retries with backoff, and counters.
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from chat_history import estimate_tokens
+
+USER = 0        # the person is waiting on it: topic check, reply
+BACKGROUND = 1  # nobody is waiting: memory summaries
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class RateLimited(Exception):
+    """The local budget had no room within the caller's wait limit."""
+
+
+def _status(error):
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _retryable(error):
+    if isinstance(error, RateLimited):
+        return False
+    status = _status(error)
+    if status is not None:
+        return status in RETRY_STATUS
+    # Connection errors and timeouts carry no status
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class _SlotStream:
+    """A streamed completion that gives its concurrency slot back when done."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self.close()
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is None:
+            return
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            close()
+        release()
+
+    def __del__(self):
+        self.close()
+
+
+class LLMGateway:
+    """
+    Requests and tokens per minute are two token buckets refilled
+    continuously. BACKGROUND calls only run when no USER call is waiting
+    and leave `background_reserve` of each bucket and one concurrency slot
+    for users. Failed calls with a retryable status are retried with full
+    jitter exponential backoff, waiting at least Retry-After if given.
+    """
+
+    def __init__(self, client, requests_per_minute=30, tokens_per_minute=6000, max_concurrency=8,
+                 max_retries=4, base_delay=0.5, max_delay=20.0, max_wait=30.0, background_reserve=0.2,
+                 default_completion_tokens=300):
+        self.client = client
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.background_reserve = background_reserve
+        self.default_completion_tokens = default_completion_tokens
+
+        self._cond = threading.Condition()
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._refilled = time.monotonic()
+        self._active = 0
+        self._waiting = [0, 0]
+        self._stats = {"calls": 0, "throttled": 0, "retried": 0, "failed": 0, "wait_seconds": 0.0}
+
+    # ---------- budget ----------
+    def _refill(self, now):
+        elapsed = now - self._refilled
+        self._refilled = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _room(self, tokens, priority):
+        if priority == USER:
+            return self._active < self.max_concurrency and self._requests >= 1 and self._tokens >= tokens
+        return (
+            self._waiting[USER] == 0
+            and self._active < self.max_concurrency - 1
+            and self._requests - 1 >= self.rpm * self.background_reserve
+            and self._tokens - tokens >= self.tpm * self.background_reserve
+        )
+
+    def _acquire(self, tokens, priority):
+        tokens = min(tokens, self.tpm * (1 - self.background_reserve))
+        start = time.monotonic()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._room(tokens, priority):
+                        break
+                    if priority == USER and now - start >= self.max_wait:
+                        raise RateLimited(f"no LLM budget within {self.max_wait:.0f}s")
+                    # Refill is continuous, so poll at roughly the rate budget frees up
+                    self._cond.wait(timeout=max(60 / self.rpm / 4, 0.05))
+                self._requests -= 1
+                self._tokens -= tokens
+                self._active += 1
+            finally:
+                self._waiting[priority] -= 1
+            waited = time.monotonic() - start
+            if waited > 0.001:
+                self._stats["throttled"] += 1
+                self._stats["wait_seconds"] += waited
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    # ---------- calls ----------
+    def _estimate(self, kwargs):
+        prompt = sum(estimate_tokens(m.get("content") or "") for m in kwargs.get("messages", []))
+        return prompt + kwargs.get("max_tokens", self.default_completion_tokens)
+
+    def create(self, priority=USER, **kwargs):
+        """chat.completions.create with rate limiting, retries and a concurrency slot."""
+        tokens = self._estimate(kwargs)
+        with self._cond:
+            self._stats["calls"] += 1
+        attempt = 0
+        while True:
+            try:
+                self._acquire(tokens, priority)
+            except RateLimited:
+                with self._cond:
+                    self._stats["failed"] += 1
+                raise
+            try:
+                result = self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                self._release()
+                if not _retryable(e) or attempt >= self.max_retries:
+                    with self._cond:
+                        self._stats["failed"] += 1
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                delay = max(delay, _retry_after(e) or 0)
+                attempt += 1
+                with self._cond:
+                    self._stats["retried"] += 1
+                time.sleep(delay)
+                continue
+
+            if kwargs.get("stream"):
+                # The slot is held until the stream is consumed or closed
+                return _SlotStream(result, self._release)
+            self._release()
+            return result
+
+    def for_priority(self, priority):
+        """Client-shaped view: `.chat.completions.create(...)` at `priority`."""
+        create = lambda **kwargs: self.create(priority, **kwargs)
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return dict(
+                self._stats,
+                active=self._active,
+                waiting_user=self._waiting[USER],
+                waiting_background=self._waiting[BACKGROUND],
+                requests_left=round(self._requests, 1),
+                tokens_left=round(self._tokens)
+            )
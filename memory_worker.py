@@ -0,0 +1,82 @@
+# memory_worker.py
+# Background conversation-memory summaries, one job per session at a time.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="memory")
+
+
+class MemorySummarizer:
+    """
+    Holds a session's memory summary and refreshes it off the request path.
+
+    Each job folds only the messages since the last checkpoint (at most
+    `max_messages` of them) into the current summary, so its cost doesn't
+    grow with the conversation. While a job runs, newer requests replace
+    each other and only the latest history is summarized next.
+    """
+
+    def __init__(self, summarize_fn, memory, every=4, min_history=6, max_messages=8):
+        self.summarize_fn = summarize_fn
+        self.memory = memory
+        self.every = every
+        self.min_history = min_history
+        self.max_messages = max_messages
+
+        self.checkpoint = 0
+        self.version = 0
+        self._pending = None
+        self._running = False
+        self._lock = threading.Lock()
+        self.stats = {"jobs": 0, "coalesced": 0, "skipped": 0, "failures": 0, "last_seconds": 0.0}
+
+    def _due(self, length):
+        return length >= self.min_history and length - self.checkpoint >= self.every
+
+    def submit(self, history):
+        """
+        Queue a summary if enough has happened since the last one.
+        `history` is a ChatHistory (anything with len() and tail(n)).
+        """
+        with self._lock:
+            if not self._due(len(history)):
+                return False
+            if self._pending is not None:
+                self.stats["coalesced"] += 1
+            # Only the tail can ever be summarized, so don't copy the rest
+            self._pending = (len(history), history.tail(self.max_messages))
+            if not self._running:
+                self._running = True
+                _POOL.submit(self._run)
+            return True
+
+    def _run(self):
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, None
+                if pending is None:
+                    self._running = False
+                    return
+                length, tail = pending
+                if not self._due(length):
+                    # Covered by the job that just finished
+                    self.stats["skipped"] += 1
+                    continue
+                messages = tail[-min(length - self.checkpoint, self.max_messages):]
+                memory = self.memory
+
+            start = time.perf_counter()
+            try:
+                summary = self.summarize_fn(memory, messages)
+            except Exception:
+                with self._lock:
+                    self.stats["failures"] += 1
+                continue
+
+            with self._lock:
+                self.memory = summary
+                self.checkpoint = length
+                self.version += 1
+                self.stats["jobs"] += 1
+                self.stats["last_seconds"] = time.perf_counter() - start
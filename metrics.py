@@ -0,0 +1,213 @@
+# metrics.py
+# Timing spans around the slow stages of a rerun: kept per rerun for the
+# debug panel and aggregated per process into histograms for export.
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds in seconds, Prometheus-style (cumulative on export)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.observe(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        i = 0
+        while seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Estimate, interpolated linearly inside the bucket it falls in."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = min(BUCKETS[i], self.max)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+
+class Metrics:
+    """
+    `span(name)` times a block. When disabled it returns one shared no-op
+    context manager, so instrumented code costs a method call and nothing
+    else. Spans observed on the thread running the script are also added
+    to the current rerun's record; spans from worker threads (memory
+    summaries) only go into the process histograms.
+
+    Each finished rerun can be appended to `jsonl_path`, and the
+    histograms written in Prometheus text format to `prometheus_path`
+    (for node_exporter's textfile collector) at most every
+    `prometheus_interval` seconds.
+    """
+
+    def __init__(self, enabled=False, jsonl_path=None, prometheus_path=None, prometheus_interval=15.0,
+                 keep_reruns=100):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.prometheus_interval = prometheus_interval
+        self._histograms = {}
+        self._reruns = deque(maxlen=keep_reruns)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._prometheus_written = 0.0
+
+    # ---------- recording ----------
+    def span(self, name):
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = Histogram()
+            hist.observe(seconds)
+        stages = getattr(self._local, "stages", None)
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def fragment(self, name):
+        """
+        Times a fragment's body as `name`. Inside a full rerun that is an
+        ordinary span; when Streamlit reruns only the fragment it also
+        opens and closes a rerun record of its own.
+        """
+        if not self.enabled:
+            yield
+            return
+        if getattr(self._local, "stages", None) is not None:
+            with self.span(name):
+                yield
+            return
+        self.begin_rerun()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.end_rerun(time.perf_counter() - start, name=name, fragment=name)
+
+    def begin_rerun(self):
+        if self.enabled:
+            self._local.stages = {}
+
+    def end_rerun(self, seconds, name="rerun", **labels):
+        """
+        Closes the rerun started on this thread; its total is observed as `name`.
+        Returns: the rerun record, or None when disabled
+        """
+        if not self.enabled:
+            return None
+        self.observe(name, seconds)
+        stages, self._local.stages = getattr(self._local, "stages", None) or {}, None
+        stages.pop(name, None)
+        record = dict(
+            labels,
+            ts=round(time.time(), 3),
+            rerun_ms=round(seconds * 1000, 2),
+            stages={name: round(sec * 1000, 2) for name, sec in stages.items()}
+        )
+        with self._lock:
+            self._reruns.append(record)
+        if self.jsonl_path:
+            with open(self.jsonl_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        if self.prometheus_path and time.monotonic() - self._prometheus_written >= self.prometheus_interval:
+            self._prometheus_written = time.monotonic()
+            self.write_prometheus(self.prometheus_path)
+        return record
+
+    # ---------- reading ----------
+    def summary(self):
+        """Returns: {stage: {"count", "mean_ms", "p50_ms", "p95_ms", "max_ms"}}"""
+        with self._lock:
+            return {
+                name: {
+                    "count": h.count,
+                    "mean_ms": round(h.sum / h.count * 1000, 1),
+                    "p50_ms": round(h.quantile(0.5) * 1000, 1),
+                    "p95_ms": round(h.quantile(0.95) * 1000, 1),
+                    "max_ms": round(h.max * 1000, 1),
+                }
+                for name, h in sorted(self._histograms.items())
+            }
+
+    def recent_reruns(self):
+        with self._lock:
+            return list(self._reruns)
+
+    def json_lines(self):
+        return "".join(json.dumps(r) + "\n" for r in self.recent_reruns())
+
+    def prometheus(self):
+        """Returns: the histograms in Prometheus text exposition format"""
+        lines = [
+            "# HELP mindcare_stage_seconds Time spent in each instrumented stage.",
+            "# TYPE mindcare_stage_seconds histogram",
+        ]
+        with self._lock:
+            for name, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS, h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'mindcare_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'mindcare_stage_seconds_sum{{stage="{name}"}} {h.sum:.6f}')
+                lines.append(f'mindcare_stage_seconds_count{{stage="{name}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Written whole and renamed so a scraper never reads half a file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
@@ -0,0 +1,51 @@
+# migrate_users.py
+# One-shot copy of the mindcare_users sheet into the local SQLite user store.
+#
+#   python migrate_users.py --db mindcare_users.db
+#   python migrate_users.py --credentials service_account.json --replace
+import argparse
+import json
+import time
+
+from user_store import SHEET_NAME, SQLiteUserStore, open_user_sheet
+
+
+def load_service_account(path):
+    if path:
+        with open(path) as f:
+            return json.load(f)
+    import streamlit as st
+    return dict(st.secrets["service_account"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the users sheet into a SQLite user store.")
+    parser.add_argument("--db", default="mindcare_users.db")
+    parser.add_argument("--sheet", default=SHEET_NAME)
+    parser.add_argument("--credentials", help="service account JSON (default: st.secrets)")
+    parser.add_argument("--replace", action="store_true", help="overwrite users that already exist locally")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sheet = open_user_sheet(load_service_account(args.credentials), args.sheet)
+    values = sheet.get_all_values()
+    if not values:
+        print("sheet is empty")
+        return
+
+    header = values[0]
+    user_col, email_col, hash_col = (header.index(c) for c in ("username", "email", "password_hash"))
+    rows = [
+        (r[user_col], r[email_col] if len(r) > email_col else "", r[hash_col])
+        for r in values[1:]
+        if len(r) > hash_col and r[user_col] and r[hash_col]
+    ]
+
+    store = SQLiteUserStore(args.db)
+    written = store.add_many(rows, replace=args.replace)
+    print(f"read {len(values) - 1} sheet rows, wrote {written} users to {args.db} "
+          f"({len(rows) - written} skipped) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
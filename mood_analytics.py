@@ -0,0 +1,147 @@
+# mood_analytics.py
+# Streaks, weekday patterns, volatility, z-score alerts and note-length
+# trends, all computed from a JournalAggregate's per-day totals.
+import datetime
+
+import numpy as np
+import pandas as pd
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+GOOD_MOOD = 4
+
+
+def _day_numbers(index):
+    return index.values.astype("datetime64[D]").astype(np.int64)
+
+
+def weekly_totals(daily, columns):
+    """
+    Sums of `columns` per Monday-to-Sunday week, labelled by the Sunday
+    (like resample("W"), but a bincount instead of a groupby).
+    Returns: DataFrame of the weeks that have entries
+    """
+    days = _day_numbers(daily.index)
+    # Day 0 (1970-01-01) was a Thursday, so +3 puts Mondays on multiples of 7
+    weeks = (days + 3) // 7
+    first = weeks[0] if len(weeks) else 0
+    slot = weeks - first
+    totals = {c: np.bincount(slot, weights=daily[c].values) for c in columns}
+    counts = np.bincount(slot, weights=daily["count"].values)
+    keep = counts > 0
+    sundays = ((np.flatnonzero(keep) + first) * 7 + 3).astype("datetime64[D]")
+    frame = pd.DataFrame({c: v[keep] for c, v in totals.items()}, index=pd.DatetimeIndex(sundays, name="date"))
+    frame["count"] = counts[keep]
+    return frame
+
+
+def runs(days):
+    """
+    Runs of consecutive values in sorted integer day numbers.
+    Returns: (first day of each run, run lengths)
+    """
+    if len(days) == 0:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    breaks = np.flatnonzero(np.diff(days) != 1) + 1
+    starts = np.r_[0, breaks]
+    lengths = np.diff(np.r_[starts, len(days)])
+    return days[starts], lengths
+
+
+def _current(firsts, lengths, today):
+    # A streak is still alive if its last day is today or yesterday
+    if len(firsts) == 0 or today - (firsts[-1] + lengths[-1] - 1) > 1:
+        return 0
+    return int(lengths[-1])
+
+
+def streaks(daily_mean, today=None):
+    """
+    Returns: dict with current/longest streaks of days with an entry, and
+    of days whose mean mood was at least GOOD_MOOD
+    """
+    today = np.datetime64(today or datetime.date.today(), "D").astype(np.int64)
+    days = _day_numbers(daily_mean.index)
+    firsts, lengths = runs(days)
+    good_firsts, good_lengths = runs(days[daily_mean.values >= GOOD_MOOD])
+    return {
+        "current": _current(firsts, lengths, today),
+        "longest": int(lengths.max(initial=0)),
+        "good_current": _current(good_firsts, good_lengths, today),
+        "good_longest": int(good_lengths.max(initial=0)),
+    }
+
+
+def weekday_profile(daily):
+    """Entry-weighted mean mood for each weekday, Mon..Sun (NaN if never logged)."""
+    weekday = daily.index.dayofweek.values
+    sums = np.bincount(weekday, weights=daily["sum"].values, minlength=7)
+    counts = np.bincount(weekday, weights=daily["count"].values, minlength=7)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.Series(sums / counts, index=WEEKDAYS, name="mood")
+
+
+def entry_volatility(daily):
+    """Standard deviation over all entries, from the per-day sums of squares."""
+    n = daily["count"].sum()
+    if n < 2:
+        return float("nan")
+    mean = daily["sum"].sum() / n
+    return float(np.sqrt(max(daily["sumsq"].sum() / n - mean * mean, 0.0) * n / (n - 1)))
+
+
+def rolling_volatility(daily_mean, days=30, min_days=3):
+    """Standard deviation of the daily mean over the last `days` calendar days."""
+    return daily_mean.rolling(f"{days}D", min_periods=min_days).std()
+
+
+def zscore_alerts(daily_mean, days=28, threshold=2.0, min_days=7):
+    """
+    Days whose mean mood is at least `threshold` standard deviations away
+    from the `days` before it (the day itself is not part of its baseline).
+    Returns: DataFrame of flagged days with mood, baseline and z
+    """
+    window = daily_mean.rolling(f"{days}D", closed="left", min_periods=min_days)
+    baseline = window.mean()
+    spread = window.std()
+    z = (daily_mean - baseline) / spread.where(spread > 0)
+    frame = pd.DataFrame({"mood": daily_mean, "baseline": baseline, "z": z})
+    return frame[z.abs() >= threshold]
+
+
+def note_length(daily, weeks=8):
+    """
+    Weekly mean note length, and its slope over the last `weeks` weeks.
+    Returns: (Series of characters per entry, slope in characters per week)
+    """
+    weekly = weekly_totals(daily, ["note_chars"])
+    series = weekly["note_chars"] / weekly["count"]
+    recent = series.tail(weeks)
+    if len(recent) < 2:
+        return series, 0.0
+    x = (_day_numbers(recent.index) - _day_numbers(recent.index)[0]) / 7
+    return series, float(np.polyfit(x, recent.values, 1)[0])
+
+
+def analyze(agg, today=None):
+    """
+    Everything the dashboard shows beyond the raw trend. Cached on the
+    aggregate until it gets new entries, except the streaks: they depend
+    on `today`, so they are recomputed (one pass over the days) each call.
+    Returns: dict
+    """
+    def compute():
+        daily_mean = agg.daily_mean()
+        notes, note_slope = note_length(agg.daily)
+        return {
+            "daily_mean": daily_mean,
+            "weekday": weekday_profile(agg.daily),
+            "volatility": entry_volatility(agg.daily),
+            "rolling_volatility": rolling_volatility(daily_mean),
+            "alerts": zscore_alerts(daily_mean),
+            "note_length": notes,
+            "note_slope": note_slope,
+        }
+
+    report = dict(agg.cached("analytics", compute))
+    report["streaks"] = streaks(report["daily_mean"], today)
+    return report
@@ -0,0 +1,120 @@
+# passwords.py
+# bcrypt hashing on a bounded thread pool with a calibrated work factor.
+#
+#   python passwords.py --logins 64      # calibrate, then measure login throughput
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+# bcrypt.gensalt()'s default; calibration may only raise the cost from here
+MIN_ROUNDS = 12
+MAX_ROUNDS = 16
+
+
+def hash_rounds(password_hash):
+    """Cost factor of a "$2b$12$..." hash, or 0 if it can't be read."""
+    try:
+        return int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def calibrate(target_seconds=0.25, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS):
+    """
+    Pick the largest cost whose hash time stays under `target_seconds`.
+    Each extra round doubles the work, so one timing at `min_rounds` is enough.
+    """
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=min_rounds))
+    base = time.perf_counter() - start
+
+    rounds = min_rounds
+    while rounds < max_rounds and base * 2 ** (rounds + 1 - min_rounds) <= target_seconds:
+        rounds += 1
+    return rounds
+
+
+class PasswordHasher:
+    """
+    bcrypt releases the GIL, so a thread pool sized to the CPU count runs
+    hashes in parallel while keeping Streamlit's rerun threads from piling
+    more concurrent hashes onto the cores than there are cores.
+    """
+
+    def __init__(self, rounds=12, max_workers=None):
+        self.rounds = rounds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 2, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._stats = {"hashes": 0, "verifies": 0, "rehashes": 0, "busy_seconds": 0.0}
+        self._started = time.monotonic()
+
+    def _timed(self, kind, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._stats[kind] += 1
+                self._stats["busy_seconds"] += time.perf_counter() - start
+
+    def hash(self, password):
+        return self._pool.submit(
+            self._timed, "hashes",
+            lambda: bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds)).decode()
+        ).result()
+
+    def verify(self, password, password_hash):
+        return self._pool.submit(
+            self._timed, "verifies",
+            lambda: bcrypt.checkpw(password.encode(), password_hash.encode())
+        ).result()
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) < self.rounds
+
+    def rehash_async(self, password, save):
+        """Hash `password` at the current cost in the background and pass it to `save`."""
+        def run():
+            save(bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds)).decode())
+        return self._pool.submit(self._timed, "rehashes", run)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, rounds=self.rounds)
+        elapsed = time.monotonic() - self._started
+        stats["verifies_per_second"] = stats["verifies"] / elapsed if elapsed else 0.0
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate bcrypt cost and measure login throughput.")
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    rounds = calibrate(args.target_ms / 1000)
+    hasher = PasswordHasher(rounds, args.workers)
+    stored = hasher.hash("hunter2")
+    print(f"calibrated cost: {rounds} rounds for a {args.target_ms:.0f} ms target")
+
+    start = time.perf_counter()
+    for _ in range(args.logins):
+        bcrypt.checkpw(b"hunter2", stored.encode())
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.logins) as callers:
+        list(callers.map(lambda _: hasher.verify("hunter2", stored), range(args.logins)))
+    pooled = time.perf_counter() - start
+
+    print(f"serial: {args.logins / serial:.1f} logins/s, "
+          f"pooled ({hasher._pool._max_workers} workers): {args.logins / pooled:.1f} logins/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# resources.py
+# Process-wide Groq and Google Sheets clients, created on first use.
+import threading
+import time
+
+from llm_gateway import LLMGateway
+from user_store import SHEET_NAME, open_user_sheet
+
+
+def _is_auth_error(error):
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 401:
+        return True
+    return type(error).__name__ in ("RefreshError", "AccessTokenRefreshError")
+
+
+class LazySheet:
+    """
+    Stands in for a gspread Worksheet. The sheet is opened on the first
+    method call, and a call failing with expired/revoked credentials
+    reconnects once and retries.
+    """
+
+    def __init__(self, open_fn, on_open=None):
+        self._open_fn = open_fn
+        self._on_open = on_open
+        self._sheet = None
+        self._lock = threading.Lock()
+        self.reconnects = 0
+
+    def _get(self):
+        with self._lock:
+            if self._sheet is None:
+                start = time.perf_counter()
+                self._sheet = self._open_fn()
+                if self._on_open is not None:
+                    self._on_open(time.perf_counter() - start)
+            return self._sheet
+
+    def reset(self):
+        with self._lock:
+            self._sheet = None
+
+    @property
+    def is_open(self):
+        return self._sheet is not None
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            try:
+                return getattr(self._get(), name)(*args, **kwargs)
+            except Exception as e:
+                if not _is_auth_error(e):
+                    raise
+                self.reset()
+                self.reconnects += 1
+                return getattr(self._get(), name)(*args, **kwargs)
+        return call
+
+
+class Resources:
+    """
+    Clients shared by every session in the process. Groq keeps one httpx
+    connection pool, and gspread one authorized session whose service
+    account token refreshes itself; nothing is created until first use.
+    """
+
+    def __init__(self, secrets):
+        self._secrets = secrets
+        self._lock = threading.Lock()
+        self._groq = None
+        self._llm = None
+        self._timings = {}
+        self._counts = {}
+        self.sheet = LazySheet(self._open_sheet, on_open=lambda sec: self._record("sheet_open", sec))
+
+    def _record(self, name, seconds):
+        self._timings[name] = seconds
+        self._counts[name] = self._counts.get(name, 0) + 1
+
+    def _open_sheet(self):
+        return open_user_sheet(self._secrets["service_account"], self._secrets.get("USER_SHEET", SHEET_NAME))
+
+    def groq(self):
+        with self._lock:
+            if self._groq is None:
+                from groq import Groq
+
+                start = time.perf_counter()
+                # Retries are the gateway's job, so the SDK doesn't retry too
+                self._groq = Groq(api_key=self._secrets["GROQ_API_KEY"], max_retries=0)
+                self._record("groq_init", time.perf_counter() - start)
+            return self._groq
+
+    def llm(self):
+        """The rate-limited gateway every completion should go through."""
+        client = self.groq()
+        with self._lock:
+            if self._llm is None:
+                self._llm = LLMGateway(
+                    client,
+                    requests_per_minute=int(self._secrets.get("GROQ_RPM", 30)),
+                    tokens_per_minute=int(self._secrets.get("GROQ_TPM", 6000)),
+                    max_concurrency=int(self._secrets.get("GROQ_MAX_CONCURRENCY", 8))
+                )
+            return self._llm
+
+    def report(self):
+        """Init time (ms) and how often each client was (re)created."""
+        report = {
+            name: {"last_ms": round(sec * 1000, 1), "created": self._counts[name]}
+            for name, sec in self._timings.items()
+        }
+        report["sheet_reconnects"] = self.sheet.reconnects
+        if self._llm is not None:
+            report["llm"] = self._llm.stats()
+        return report
@@ -0,0 +1,82 @@
+# response_cache.py
+# Process-wide cache of topic verdicts.
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_NOISE_RE = re.compile(r"[^\w\s']+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Lowercase, drop punctuation/emoji and collapse whitespace."""
+    return _SPACE_RE.sub(" ", _NOISE_RE.sub(" ", text.lower())).strip()
+
+
+def cache_key(text):
+    # Keys are hashed so the cache never holds users' raw messages
+    return hashlib.blake2b(normalize(text).encode(), digest_size=16).digest()
+
+
+class TTLCache:
+    """LRU cache with a per-entry time-to-live and hit/miss/eviction counters."""
+
+    def __init__(self, max_entries=10000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] < time.monotonic():
+                del self._data[key]
+                self._stats["expired"] += 1
+                item = None
+            if item is None:
+                self._stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return item[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._data))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class ResponseCache:
+    """
+    Only user-independent answers are cached: the MENTAL/OTHER verdict for
+    a message. Replies from the model depend on the user's memory and
+    conversation, so they are never stored here, and the refusal for OTHER
+    messages is a constant that needs no caching.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600):
+        self.verdicts = TTLCache(max_entries, ttl)
+
+    def get_verdict(self, text):
+        return self.verdicts.get(cache_key(text))
+
+    def put_verdict(self, text, verdict):
+        if verdict in ("MENTAL", "OTHER"):
+            self.verdicts.put(cache_key(text), verdict)
+
+    def stats(self):
+        return {"verdicts": self.verdicts.stats()}
@@ -0,0 +1,241 @@
+# session_store.py
+# Login state, chat history and memory kept outside st.session_state, so
+# any worker process can pick up a session and a restart loses nothing.
+import json
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from chat_history import ChatHistory
+
+
+def new_token():
+    return secrets.token_urlsafe(16)
+
+
+def known_token(store, token):
+    """True if `token` names a session this store has written."""
+    return store.get(f"auth:{token}") is not None or store.get(f"guest:{token}") is not None
+
+
+class MemorySessionStore:
+    """
+    Process-local: survives reconnects to this process, not restarts.
+    Holds at most `max_entries` records, dropping the least recently used,
+    and on writes drops records untouched for `max_age` seconds (checked
+    at most every `purge_interval` seconds).
+    """
+
+    def __init__(self, max_entries=5000, max_age=None, purge_interval=600):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.purge_interval = purge_interval
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._purged_at = time.time()
+        self._stats = {"reads": 0, "writes": 0, "evicted": 0}
+
+    def get(self, key):
+        with self._lock:
+            self._stats["reads"] += 1
+            item = self._data.get(key)
+            if item:
+                # Reads count as use, which keeps the order by last use
+                self._data[key] = (item[0], time.time())
+                self._data.move_to_end(key)
+        return item[0] if item else None
+
+    def put_many(self, items):
+        now = time.time()
+        with self._lock:
+            self._stats["writes"] += 1
+            for key, value in items.items():
+                self._data[key] = (value, now)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats["evicted"] += 1
+        if self.max_age is not None and now - self._purged_at >= self.purge_interval:
+            self.purge(self.max_age)
+
+    def purge(self, max_age):
+        now = time.time()
+        with self._lock:
+            self._purged_at = now
+            # Least recently used first, so stop at the first fresh record
+            while self._data:
+                key, (_, updated) = next(iter(self._data.items()))
+                if updated >= now - max_age:
+                    break
+                del self._data[key]
+                self._stats["evicted"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, backend="memory", sessions=len(self._data))
+
+
+class SQLiteSessionStore:
+    """
+    A WAL-mode database file shared by every worker process on the host.
+    One connection per thread, like SQLiteUserStore. Like the memory
+    store, writes drop records older than `max_age` now and then.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        key     TEXT PRIMARY KEY,
+        value   BLOB NOT NULL,
+        updated REAL NOT NULL
+    ) WITHOUT ROWID
+    """
+
+    def __init__(self, path="mindcare_sessions.db", max_age=None, purge_interval=3600):
+        self.path = path
+        self.max_age = max_age
+        self.purge_interval = purge_interval
+        self._purged_at = time.time()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"reads": 0, "writes": 0}
+        with self._connect() as conn:
+            conn.execute(self.SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        with self._lock:
+            self._stats["reads"] += 1
+        row = self._connect().execute("SELECT value FROM sessions WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, items):
+        """All of `items` ({key: bytes}) in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._stats["writes"] += 1
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sessions (key, value, updated) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()]
+            )
+        if self.max_age is not None and now - self._purged_at >= self.purge_interval:
+            self.purge(self.max_age)
+
+    def purge(self, max_age):
+        self._purged_at = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - max_age,))
+
+    def stats(self):
+        (count,) = self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()
+        with self._lock:
+            return dict(self._stats, backend="sqlite", sessions=count)
+
+
+# ---------- one browser session ----------
+class SessionSync:
+    """
+    Binds one browser session, identified by `token`, to a store.
+
+    Login state is kept under "auth:<token>". The conversation (history,
+    memory and the summarizer checkpoint) is kept under "user:<name>"
+    once logged in, so it follows the user to any device, and under
+    "guest:<token>" before that. Records are read the first time they
+    are needed; flush() writes whatever changed since the last write, in
+    one put_many, so a rerun costs at most one write.
+
+    The token is a bearer credential for the login, so auth records
+    expire `auth_ttl` seconds after login, and login() moves the browser
+    to a fresh token: a token someone else knew beforehand (say, from a
+    link they sent) never becomes logged in.
+    """
+
+    def __init__(self, store, token, auth_ttl=12 * 3600):
+        self.store = store
+        self.token = token
+        self.auth_ttl = auth_ttl
+        self._saved = {}
+
+    def load_auth(self):
+        """Returns: (logged_in, username)"""
+        key = f"auth:{self.token}"
+        raw = self.store.get(key)
+        auth = json.loads(raw) if raw else {}
+        if auth.get("logged_in") and time.time() - auth.get("at", 0) > self.auth_ttl:
+            auth = {}
+        state = (bool(auth.get("logged_in")), auth.get("username"))
+        self._saved[key] = state
+        return state
+
+    def conversation_key(self, username):
+        return f"user:{username}" if username else f"guest:{self.token}"
+
+    def load_conversation(self, key):
+        """Returns: (ChatHistory, memory, checkpoint) or None if nothing is stored"""
+        raw = self.store.get(key)
+        if raw is None:
+            return None
+        size = int.from_bytes(raw[:4], "big")
+        meta = json.loads(zlib.decompress(raw[4:4 + size]))
+        history = ChatHistory.loads(raw[4 + size:])
+        self._saved[key] = (len(history), meta["memory"], meta["checkpoint"])
+        return history, meta["memory"], meta["checkpoint"]
+
+    def flush(self, logged_in, username, history, memory, checkpoint):
+        """
+        Writes the auth and conversation records that differ from what
+        was last loaded or written.
+        Returns: number of records written
+        """
+        items = {}
+        auth_key = f"auth:{self.token}"
+        auth = (bool(logged_in), username if logged_in else None)
+        if self._saved.get(auth_key) != auth:
+            items[auth_key] = json.dumps({"logged_in": auth[0], "username": auth[1], "at": time.time()}).encode()
+
+        key = self.conversation_key(username if logged_in else None)
+        # The history only grows, so its length is enough to spot a change
+        conversation = (len(history), memory, checkpoint)
+        if self._saved.get(key) != conversation:
+            meta = zlib.compress(json.dumps({"memory": memory, "checkpoint": checkpoint}).encode())
+            items[key] = len(meta).to_bytes(4, "big") + meta + history.dumps()
+
+        if items:
+            self.store.put_many(items)
+            self._saved[auth_key] = auth
+            self._saved[key] = conversation
+        return len(items)
+
+    def login(self):
+        """
+        Moves this browser to a fresh token; the next flush writes the
+        login under it.
+        Returns: the new token
+        """
+        self.token = new_token()
+        self._saved = {}
+        return self.token
+
+    def logout(self):
+        """
+        Records the logout now and moves this browser to a fresh token,
+        so the next conversation starts empty.
+        Returns: the new token
+        """
+        self.store.put_many({
+            f"auth:{self.token}": json.dumps({"logged_in": False, "username": None, "at": time.time()}).encode()
+        })
+        self.token = new_token()
+        self._saved = {}
+        return self.token
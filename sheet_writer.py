@@ -0,0 +1,269 @@
+# sheet_writer.py
+# Write-behind queue that batches row appends to a Google Sheet.
+import atexit
+import glob
+import json
+import os
+import random
+import secrets
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: one spool file, so run a single worker process
+    fcntl = None
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def split_written(sheet, rows, key_col=0):
+    """
+    An append isn't idempotent: one that failed (a timeout, a 5xx) may
+    still have landed. Before sending `rows` again, read the key column
+    once and set aside the rows already there.
+    Returns: (rows still to write, rows already in the sheet)
+    """
+    present = set(sheet.col_values(key_col + 1))
+    missing = [row for row in rows if row[key_col] not in present]
+    return missing, [row for row in rows if row[key_col] in present]
+
+
+def _try_lock(path):
+    """
+    Returns: an fd holding an exclusive flock on `path`, or None if another
+    process holds it
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class WriteBehindAppender:
+    """
+    Rows are acknowledged once they are in memory and fsync'd to a local
+    spool file; a background thread sends them with one `append_rows`
+    call when `batch_size` rows are pending or the oldest has waited
+    `flush_interval` seconds. Failed flushes (e.g. 429 quota errors) keep
+    the rows and retry with jittered exponential backoff.
+
+    Every process spools to its own file next to `spool_path`
+    ("signup_spool.<id>.jsonl") and holds a flock on "<file>.lock" while
+    it runs. On startup, spools whose lock is free belong to processes
+    that died; their rows are taken over and replayed. Spools of live
+    workers are left alone.
+
+    Rows are keyed by their first cell (the username), which is what
+    `pending()` looks up for read-your-writes.
+    """
+
+    def __init__(self, sheet, spool_path, batch_size=20, flush_interval=2.0,
+                 max_backoff=60.0, on_flushed=None, already_written=None):
+        self.sheet = sheet
+        self.spool_base = spool_path
+        self._spool_lock = None
+        if fcntl is None:
+            self.spool_path = spool_path
+        else:
+            root, ext = os.path.splitext(spool_path)
+            self.spool_path = f"{root}.{os.getpid()}-{secrets.token_hex(4)}{ext}"
+            self._spool_lock = _try_lock(self.spool_path + ".lock")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.on_flushed = on_flushed
+
+        self._pending = {}
+        self._oldest = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        # Set when an append failed, or rows were replayed: they may be in
+        # the sheet already, so check before sending them
+        self._unconfirmed = False
+        self._stats = {
+            "appended": 0, "flushes": 0, "rows_flushed": 0, "retries": 0, "replayed": 0, "already_written": 0,
+            "last_error": None,
+        }
+
+        self._replay(already_written)
+        self._thread = threading.Thread(target=self._run, name="sheet-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- spool ----------
+    def _orphans(self):
+        # Spools nobody holds the lock of, each with that lock now held here
+        if fcntl is None:
+            yield self.spool_path, None
+            return
+        root, ext = os.path.splitext(self.spool_base)
+        # The un-suffixed name is where older versions spooled
+        for path in [self.spool_base] + sorted(glob.glob(f"{glob.escape(root)}.*{ext}")):
+            if path == self.spool_path:
+                continue
+            lock = _try_lock(path + ".lock")
+            if lock is not None:
+                yield path, lock
+
+    def _replay(self, already_written):
+        adopted = []
+        for path, lock in self._orphans():
+            adopted.append((path, lock))
+            try:
+                with open(path, encoding="utf-8") as f:
+                    rows = [json.loads(line) for line in f if line.strip()]
+            except FileNotFoundError:
+                continue
+            for row in rows:
+                # The previous process may have died after append_rows succeeded
+                if already_written is not None and already_written(row[0]):
+                    continue
+                self._pending[row[0]] = row
+        self._stats["replayed"] = len(self._pending)
+        if self._pending:
+            self._oldest = time.monotonic()
+            self._unconfirmed = True
+        # Durable in this process's spool before the orphans are removed
+        self._rewrite_spool()
+        for path, lock in adopted:
+            if lock is not None:
+                self._remove_spool(path, lock)
+
+    def _remove_spool(self, path, lock):
+        for name in (path, path + ".lock"):
+            try:
+                os.unlink(name)
+            except FileNotFoundError:
+                pass
+        os.close(lock)
+
+    def _rewrite_spool(self):
+        tmp = self.spool_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for row in self._pending.values():
+                f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.spool_path)
+
+    # ---------- public ----------
+    def append(self, row):
+        with self._cond:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending[row[0]] = row
+            self._stats["appended"] += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._cond.notify()
+
+    def pending(self, key):
+        with self._cond:
+            return self._pending.get(key)
+
+    def flush(self):
+        """
+        Send everything pending in one append_rows call.
+        Returns: number of rows written (raises on failure)
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._pending.values())
+            if not batch:
+                return 0
+
+            if self._unconfirmed:
+                batch, landed = split_written(self.sheet, batch)
+                if landed:
+                    self._done(landed, None)
+                    with self._cond:
+                        self._stats["already_written"] += len(landed)
+                self._unconfirmed = False
+                if not batch:
+                    return 0
+
+            try:
+                response = self.sheet.append_rows(batch)
+            except Exception:
+                self._unconfirmed = True
+                raise
+            self._done(batch, response)
+            with self._cond:
+                self._stats["flushes"] += 1
+                self._stats["rows_flushed"] += len(batch)
+            return len(batch)
+
+    def _done(self, rows, response):
+        # Index the rows before they stop being pending, so a signup
+        # checking the name in between still finds it
+        if self.on_flushed is not None:
+            self.on_flushed(rows, response)
+        with self._cond:
+            for row in rows:
+                if self._pending.get(row[0]) is row:
+                    del self._pending[row[0]]
+            self._oldest = time.monotonic() if self._pending else None
+            self._rewrite_spool()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception:
+            return  # still in the spool; taken over on the next start
+        if self._spool_lock is not None and not self._pending:
+            self._remove_spool(self.spool_path, self._spool_lock)
+            self._spool_lock = None
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, pending=len(self._pending), backoff=self._backoff)
+
+    # ---------- worker ----------
+    def _due(self, now):
+        if not self._pending or now < self._retry_at:
+            return False
+        return len(self._pending) >= self.batch_size or now - self._oldest >= self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._due(time.monotonic()):
+                    now = time.monotonic()
+                    if self._pending:
+                        wake_at = self._retry_at if len(self._pending) >= self.batch_size else max(self._retry_at, self._oldest + self.flush_interval)
+                        self._cond.wait(timeout=max(wake_at - now, 0.01))
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+            try:
+                self.flush()
+                self._backoff = 0.0
+            except Exception as e:
+                self._backoff = min(max(self._backoff * 2, 1.0), self.max_backoff)
+                delay = _retry_after(e) or self._backoff * random.uniform(0.5, 1.0)
+                with self._cond:
+                    self._retry_at = time.monotonic() + delay
+                    self._stats["retries"] += 1
+                    self._stats["last_error"] = repr(e)
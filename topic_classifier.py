@@ -0,0 +1,100 @@
+# topic_classifier.py
+# Local MENTAL/OTHER classifier: hashed n-gram multinomial naive Bayes in NumPy.
+import csv
+import os
+import re
+import zlib
+
+import numpy as np
+
+LABELS = ("MENTAL", "OTHER")
+N_FEATURES = 2 ** 16
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DATA_PATH = os.path.join(_DATA_DIR, "topic_examples.csv")
+MODEL_PATH = os.path.join(_DATA_DIR, "topic_model.npz")
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _hash(token):
+    # crc32 is stable across processes, unlike the builtin hash()
+    return zlib.crc32(token.encode()) % N_FEATURES
+
+
+def featurize(text):
+    """
+    Hash word unigrams, word bigrams and character trigrams of `text`.
+    Returns: int array of feature indices (repeats allowed)
+    """
+    words = _WORD_RE.findall(text.lower())
+    tokens = ["w:" + w for w in words]
+    tokens += ["b:" + a + " " + b for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f" {w} "
+        tokens += ["c:" + padded[i:i + 3] for i in range(len(padded) - 2)]
+    if not tokens:
+        tokens = ["<empty>"]
+    return np.fromiter((_hash(t) for t in tokens), dtype=np.int64, count=len(tokens))
+
+
+def load_examples(path=DATA_PATH):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    return [r["text"] for r in rows], [r["label"] for r in rows]
+
+
+class TopicClassifier:
+    def __init__(self, log_prior, log_likelihood):
+        self.log_prior = log_prior              # (n_labels,)
+        self.log_likelihood = log_likelihood    # (n_labels, N_FEATURES)
+
+    @classmethod
+    def train(cls, texts, labels, alpha=0.5):
+        counts = np.zeros((len(LABELS), N_FEATURES), dtype=np.float64)
+        docs = np.zeros(len(LABELS), dtype=np.float64)
+        for text, label in zip(texts, labels):
+            k = LABELS.index(label)
+            np.add.at(counts[k], featurize(text), 1.0)
+            docs[k] += 1
+
+        smoothed = counts + alpha
+        log_likelihood = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+        log_prior = np.log(docs / docs.sum())
+        return cls(log_prior, log_likelihood.astype(np.float32))
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        data = np.load(path)
+        return cls(data["log_prior"], data["log_likelihood"])
+
+    def save(self, path=MODEL_PATH):
+        np.savez_compressed(path, log_prior=self.log_prior, log_likelihood=self.log_likelihood)
+
+    def predict_proba(self, text):
+        scores = self.log_prior + self.log_likelihood[:, featurize(text)].sum(axis=1)
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, text):
+        """
+        Returns: (label, confidence in [0.5, 1])
+        """
+        proba = self.predict_proba(text)
+        k = int(proba.argmax())
+        return LABELS[k], float(proba[k])
+
+
+def load_classifier(model_path=MODEL_PATH, data_path=DATA_PATH):
+    """
+    Load the saved model, or train one from the bundled examples.
+    Returns: TopicClassifier, or None if neither is available
+    """
+    try:
+        return TopicClassifier.load(model_path)
+    except (OSError, KeyError):
+        pass
+    try:
+        return TopicClassifier.train(*load_examples(data_path))
+    except (OSError, KeyError, ValueError):
+        return None
@@ -0,0 +1,69 @@
+# train_topic_classifier.py
+# Train and evaluate the local topic classifier.
+#
+#   python train_topic_classifier.py                 # cross-validate, then save
+#   python train_topic_classifier.py --threshold 0.95 --folds 10
+import argparse
+import time
+
+import numpy as np
+
+from topic_classifier import DATA_PATH, LABELS, MODEL_PATH, TopicClassifier, load_examples
+
+
+def evaluate(model, texts, labels, threshold):
+    correct = confident = confident_correct = 0
+    for text, label in zip(texts, labels):
+        pred, conf = model.predict(text)
+        correct += pred == label
+        # Only MENTAL is ever answered locally; OTHER always goes to the LLM
+        if pred == "MENTAL" and conf >= threshold:
+            confident += 1
+            confident_correct += pred == label
+    return correct, confident, confident_correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and evaluate the local topic classifier.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--out", default=MODEL_PATH)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.99)
+    parser.add_argument("--alpha", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts, labels = load_examples(args.data)
+    print(f"{len(texts)} examples: " + ", ".join(f"{l}={labels.count(l)}" for l in LABELS))
+
+    order = np.random.default_rng(args.seed).permutation(len(texts))
+    folds = np.array_split(order, args.folds)
+    correct = confident = confident_correct = 0
+    for i, test_idx in enumerate(folds):
+        train_idx = np.concatenate([f for j, f in enumerate(folds) if j != i])
+        model = TopicClassifier.train(
+            [texts[k] for k in train_idx], [labels[k] for k in train_idx], alpha=args.alpha
+        )
+        c, n, nc = evaluate(model, [texts[k] for k in test_idx], [labels[k] for k in test_idx], args.threshold)
+        correct += c
+        confident += n
+        confident_correct += nc
+
+    total = len(texts)
+    print(f"{args.folds}-fold accuracy: {correct / total:.3f}")
+    print(f"answered locally at threshold {args.threshold}: {confident / total:.1%} "
+          f"(accuracy {confident_correct / max(confident, 1):.3f}), escalated: {1 - confident / total:.1%}")
+
+    model = TopicClassifier.train(texts, labels, alpha=args.alpha)
+    start = time.perf_counter()
+    for text in texts:
+        model.predict(text)
+    per_call = (time.perf_counter() - start) / total
+    print(f"predict latency: {per_call * 1e6:.0f} µs/message")
+
+    model.save(args.out)
+    print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# user_index.py
+# Process-wide username -> (row, password_hash) index over the users sheet.
+import re
+import threading
+import time
+
+_ROW_RE = re.compile(r"![A-Z]+(\d+)")
+
+
+def appended_row(append_response):
+    """
+    First sheet row written by an append_row(s) call.
+    Returns: row number, or None if the response doesn't say
+    """
+    if not append_response:
+        return None
+    match = _ROW_RE.search(append_response.get("updates", {}).get("updatedRange", ""))
+    return int(match.group(1)) if match else None
+
+
+def past_last_row(error):
+    """
+    True for the 400 the Sheets API returns when a range starts below the
+    sheet's last row, which is what reading "rows after the last one"
+    gets once appends have grown the grid to exactly the data.
+    """
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 400 and "exceeds grid limits" in str(error)
+
+
+class UserIndex:
+    """
+    Built from one full sheet read, then topped up incrementally by only
+    fetching rows past the last one seen once `ttl` seconds have passed.
+    A full rebuild every `full_ttl` seconds picks up edits and deletions.
+
+    Rows this process writes itself are kept in a separate overlay until
+    a read returns them: the top-up cursor only ever moves past rows that
+    were actually fetched, so rows other processes appended in between
+    are never skipped.
+    """
+
+    def __init__(self, sheet, ttl=60, full_ttl=900, miss_refresh_interval=5):
+        self.sheet = sheet
+        self.ttl = ttl
+        self.full_ttl = full_ttl
+        self.miss_refresh_interval = miss_refresh_interval
+
+        self._lock = threading.RLock()
+        self._users = {}
+        self._own = {}
+        self._columns = None
+        self._last_row = 1
+        self._refreshed_at = 0.0
+        self._built_at = 0.0
+        self._stats = {"hits": 0, "misses": 0, "full_builds": 0, "incremental_refreshes": 0, "rows_fetched": 0}
+
+    # ---------- refresh ----------
+    def _ingest(self, rows, first_row):
+        user_col, hash_col = self._columns
+        for offset, row in enumerate(rows):
+            if len(row) <= user_col or not row[user_col]:
+                continue
+            password_hash = row[hash_col] if len(row) > hash_col else ""
+            self._users[row[user_col]] = (first_row + offset, password_hash)
+            self._own.pop(row[user_col], None)
+        self._last_row = max(self._last_row, first_row + len(rows) - 1)
+        self._stats["rows_fetched"] += len(rows)
+
+    def _build(self):
+        values = self.sheet.get_all_values()
+        header = values[0] if values else ["username", "email", "password_hash"]
+        self._columns = (header.index("username"), header.index("password_hash"))
+        self._users = {}
+        self._last_row = 1
+        self._ingest(values[1:], 2)
+        self._built_at = self._refreshed_at = time.monotonic()
+        self._stats["full_builds"] += 1
+
+    def _top_up(self):
+        try:
+            rows = self.sheet.get(f"A{self._last_row + 1}:Z")
+        except Exception as e:
+            if not past_last_row(e):
+                raise
+            rows = []  # nothing appended since the last read
+        self._ingest(rows, self._last_row + 1)
+        self._refreshed_at = time.monotonic()
+        self._stats["incremental_refreshes"] += 1
+
+    def refresh(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if self._columns is None or force or now - self._built_at >= self.full_ttl:
+                self._build()
+            elif now - self._refreshed_at >= self.ttl:
+                self._top_up()
+
+    # ---------- lookups ----------
+    def lookup(self, username):
+        """
+        Returns: (row, password_hash), or None if the user is unknown
+        """
+        with self._lock:
+            self.refresh()
+            entry = self._own.get(username) or self._users.get(username)
+            if entry is None and time.monotonic() - self._refreshed_at >= self.miss_refresh_interval:
+                # May have been registered by another process since the last refresh
+                self._top_up()
+                entry = self._users.get(username)
+            self._stats["hits" if entry is not None else "misses"] += 1
+            return entry
+
+    def add(self, username, password_hash, row=None):
+        """
+        Record a row this process just wrote (`row` None if the append
+        response didn't say where it landed).
+        """
+        with self._lock:
+            self._own[username] = (row, password_hash)
+
+    def user_column(self):
+        """1-based sheet column holding usernames."""
+        with self._lock:
+            self.refresh()
+            return self._columns[0] + 1
+
+    def hash_column(self):
+        """1-based sheet column holding password hashes."""
+        with self._lock:
+            self.refresh()
+            return self._columns[1] + 1
+
+    def invalidate(self):
+        with self._lock:
+            self._columns = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, users=len(self._users), own=len(self._own))
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            return stats
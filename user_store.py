@@ -0,0 +1,189 @@
+# user_store.py
+# Storage backends for accounts: the Google Sheet or a local SQLite file.
+import sqlite3
+import threading
+
+from sheet_writer import WriteBehindAppender
+from user_index import UserIndex, appended_row, past_last_row
+
+SHEET_NAME = "mindcare_users"
+SCOPE = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+
+
+def open_user_sheet(service_account_info, sheet_name=SHEET_NAME):
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(service_account_info, SCOPE)
+    return gspread.authorize(creds).open(sheet_name).sheet1
+
+
+class UserStore:
+    """
+    What register_user / login_user need from a backend.
+    """
+
+    def get_password_hash(self, username):
+        """Returns: the stored bcrypt hash, or None if the user is unknown"""
+        raise NotImplementedError
+
+    def add_user(self, username, email, password_hash):
+        """Returns: False if the username is already taken"""
+        raise NotImplementedError
+
+    def update_password_hash(self, username, password_hash):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class SheetsUserStore(UserStore):
+    """
+    With a `spool_path`, signups go through a write-behind queue and are
+    visible to get_password_hash before they reach the sheet.
+    """
+
+    def __init__(self, sheet, spool_path=None, batch_size=20, flush_interval=2.0):
+        self.sheet = sheet
+        self.index = UserIndex(sheet)
+        self.writer = None
+        # Held from the "is this name taken" check until the row is queued
+        self._add_lock = threading.Lock()
+        if spool_path:
+            self.writer = WriteBehindAppender(
+                sheet, spool_path,
+                batch_size=batch_size, flush_interval=flush_interval,
+                on_flushed=self._flushed,
+                already_written=lambda username: self.index.lookup(username) is not None
+            )
+
+    def _flushed(self, rows, response):
+        first = appended_row(response)
+        for offset, (username, _, password_hash) in enumerate(rows):
+            self.index.add(username, password_hash, first + offset if first else None)
+
+    def get_password_hash(self, username):
+        if self.writer is not None:
+            row = self.writer.pending(username)
+            if row is not None:
+                return row[2]
+        entry = self.index.lookup(username)
+        return entry[1] if entry is not None else None
+
+    def add_user(self, username, email, password_hash):
+        with self._add_lock:
+            if self.get_password_hash(username) is not None:
+                return False
+            if self.writer is not None:
+                self.writer.append([username, email, password_hash])
+            else:
+                response = self.sheet.append_row([username, email, password_hash])
+                self.index.add(username, password_hash, appended_row(response))
+        return True
+
+    def update_password_hash(self, username, password_hash):
+        if self.writer is not None:
+            row = self.writer.pending(username)
+            if row is not None:
+                row[2] = password_hash
+                return
+        entry = self.index.lookup(username)
+        if entry is None:
+            return
+        row, _ = entry
+        # The row number may be up to full_ttl old; if rows were deleted or
+        # re-sorted since, it now belongs to someone else. Skip the write
+        # (the next login rehashes again) and rebuild the index.
+        if row is None or self._username_at(row) != username:
+            self.index.invalidate()
+            return
+        self.sheet.update_cell(row, self.index.hash_column(), password_hash)
+        self.index.add(username, password_hash, row)
+
+    def _username_at(self, row):
+        try:
+            cells = self.sheet.get(f"A{row}:Z{row}")
+        except Exception as e:
+            if not past_last_row(e):
+                raise
+            return None
+        user_col = self.index.user_column() - 1
+        return cells[0][user_col] if cells and len(cells[0]) > user_col else None
+
+    def stats(self):
+        stats = self.index.stats()
+        if self.writer is not None:
+            stats["write_behind"] = self.writer.stats()
+        return stats
+
+
+class SQLiteUserStore(UserStore):
+    """
+    One connection per thread on a WAL-mode database, so logins from
+    concurrent sessions read without blocking each other or a signup.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        username      TEXT PRIMARY KEY,
+        email         TEXT NOT NULL DEFAULT '',
+        password_hash TEXT NOT NULL,
+        created_at    TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+    """
+
+    def __init__(self, path="mindcare_users.db"):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(self.SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_password_hash(self, username):
+        row = self._connect().execute(
+            "SELECT password_hash FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def add_user(self, username, email, password_hash):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+                    (username, email, password_hash)
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def update_password_hash(self, username, password_hash):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE users SET password_hash = ? WHERE username = ?", (password_hash, username)
+            )
+
+    def add_many(self, rows, replace=False):
+        """
+        Bulk insert (username, email, password_hash) rows in one transaction.
+        Returns: number of rows written
+        """
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                f"{verb} INTO users (username, email, password_hash) VALUES (?, ?, ?)", rows
+            )
+            return conn.total_changes - before
+
+    def stats(self):
+        (count,) = self._connect().execute("SELECT COUNT(*) FROM users").fetchone()
+        return {"backend": "sqlite", "users": count}
@@ -1,17 +1,353 @@
-# utils.py (sketch)
-def speech_to_text(audio_path):
-    # 1) open file
-    # 2) send to speech recognition / whisper / STT provider
-    # 3) return string transcript or None
-    pass
-
-def text_to_speech(text):
-    # 1) call TTS provider (or locally use pyttsx3 or TTS service)
-    # 2) save to file path (e.g., "reply.mp3")
-    # 3) return path to file
-    pass
-
-def autoplay_audio(audio_file):
-    # recommended: return an st.audio element or stream a bit
-    # simplest: st.audio(audio_file, format='audio/mp3', start_time=0)
-    pass
+# utils.py
+# Server-side speech helpers: cached text-to-speech and speech-to-text.
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import streamlit as st
+
+
+# ---------- SPEECH TO TEXT ----------
+_stt_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="stt")
+
+
+def decode_wav(data):
+    """
+    Decodes PCM WAV bytes (what audio-recorder-streamlit returns) in memory.
+    Returns: (mono float32 samples in [-1, 1], sample rate)
+    """
+    with wave.open(io.BytesIO(data)) as w:
+        rate, channels, width = w.getframerate(), w.getnchannels(), w.getsampwidth()
+        raw = w.readframes(w.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, np.uint8).astype(np.float32) - 128) / 128
+    elif width in (2, 4):
+        samples = np.frombuffer(raw, f"<i{width}").astype(np.float32) / 2 ** (8 * width - 1)
+    else:
+        raise ValueError(f"unsupported sample width: {width * 8} bits")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def encode_wav(samples, rate):
+    """Returns: 16-bit mono WAV bytes"""
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def voice_segments(samples, rate, frame_ms=30, min_silence_ms=400, pad_ms=200, max_chunk_seconds=20,
+                   threshold_db=None):
+    """
+    Energy-based voice activity detection. Frames louder than
+    `threshold_db` (default: 12 dB over the 10th-percentile frame, at least
+    -50 dBFS) are speech; pauses shorter than `min_silence_ms` don't split
+    a segment. Segments longer than `max_chunk_seconds` are cut at their
+    quietest frame near the limit.
+    Returns: list of (start, end) sample offsets
+    """
+    frame = max(1, rate * frame_ms // 1000)
+    n = len(samples) // frame
+    if n == 0:
+        return []
+    frames = samples[:n * frame].reshape(n, frame)
+    db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    if threshold_db is None:
+        threshold_db = max(np.percentile(db, 10) + 12, -50)
+
+    voiced = np.flatnonzero(db > threshold_db)
+    if voiced.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(voiced) > min_silence_ms // frame_ms)
+    starts = voiced[np.r_[0, breaks + 1]]
+    ends = voiced[np.r_[breaks, voiced.size - 1]] + 1
+
+    pad = pad_ms // frame_ms
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, n)
+    starts[1:] = np.maximum(starts[1:], ends[:-1])
+
+    max_frames = max(1, int(max_chunk_seconds * 1000 // frame_ms))
+    search = max_frames // 4
+    segments = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        while end - start > max_frames:
+            window = db[start + max_frames - search:start + max_frames]
+            cut = start + max_frames - search + int(np.argmin(window))
+            segments.append((start, cut))
+            start = cut
+        segments.append((start, end))
+    return [(start * frame, end * frame) for start, end in segments]
+
+
+def stub_backend(wav_bytes, lang):
+    """Offline stand-in for an STT provider: describes the chunk instead of transcribing it."""
+    with wave.open(io.BytesIO(wav_bytes)) as w:
+        seconds = w.getnframes() / w.getframerate()
+    return f"[{seconds:.1f}s of speech]"
+
+
+def transcribe(audio, backend=stub_backend, lang="en", **vad):
+    """
+    Trims and splits `audio` (WAV bytes) on silence, then sends the speech
+    chunks to `backend(wav_bytes, lang) -> str` concurrently.
+    Returns: dict with "text", chunk and byte counts, and stage timings
+    """
+    t0 = time.perf_counter()
+    samples, rate = decode_wav(audio)
+    t1 = time.perf_counter()
+    chunks = [encode_wav(samples[start:end], rate) for start, end in voice_segments(samples, rate, **vad)]
+    t2 = time.perf_counter()
+    parts = list(_stt_pool.map(lambda chunk: backend(chunk, lang), chunks))
+    t3 = time.perf_counter()
+
+    sent = sum(len(chunk) for chunk in chunks)
+    return {
+        "text": " ".join(p.strip() for p in parts if p and p.strip()),
+        "chunks": len(chunks),
+        "audio_seconds": len(samples) / rate,
+        "bytes_in": len(audio),
+        "bytes_sent": sent,
+        "bytes_saved": len(audio) - sent,
+        "timings": {"decode": t1 - t0, "vad": t2 - t1, "transcribe": t3 - t2, "total": t3 - t0},
+    }
+
+
+def speech_to_text(audio, backend=stub_backend, lang="en"):
+    """
+    `audio` is a WAV file path or the recorded bytes.
+    Returns: transcript string, or None if nothing was said
+    """
+    if isinstance(audio, str):
+        with open(audio, "rb") as f:
+            audio = f.read()
+    return transcribe(audio, backend, lang)["text"] or None
+
+
+# ---------- TEXT TO SPEECH ----------
+AUDIO_MIME = {".wav": "audio/wav", ".mp3": "audio/mp3"}
+
+# The app's language codes mapped to espeak voices
+ESPEAK_VOICES = {"en-IN": "en", "en-US": "en-us", "hi-IN": "hi"}
+
+_pyttsx3_lock = threading.Lock()
+_pyttsx3_voices = {}
+
+
+def espeak_engine(text, lang, voice, out_path):
+    """Writes a WAV with espeak-ng (or espeak). Text goes over stdin, not argv."""
+    exe = shutil.which("espeak-ng") or shutil.which("espeak")
+    if exe is None:
+        raise RuntimeError("espeak is not installed")
+    voice = voice or ESPEAK_VOICES.get(lang, lang.split("-")[0].lower())
+    subprocess.run(
+        [exe, "-v", voice, "-w", out_path, "--stdin"],
+        input=text.encode(), check=True, capture_output=True, timeout=60
+    )
+
+
+def _language_tags(voice):
+    # "en_US", b"\x05en-us" (espeak driver) or a SAPI id like "...TTS_MS_EN-US_ZIRA_11.0"
+    tags = []
+    for tag in list(getattr(voice, "languages", None) or []) + [voice.id]:
+        if isinstance(tag, bytes):
+            tag = tag.decode(errors="ignore")
+        # espeak prefixes a priority byte
+        tags.append("".join(c for c in tag if c.isprintable()).lower().replace("_", "-"))
+    return tags
+
+
+def _pyttsx3_voice(engine, lang):
+    """
+    Installed voice for `lang` ("hi-IN"): an exact match first, then one
+    for the same language ("hi").
+    Returns: voice id or None
+    """
+    if lang not in _pyttsx3_voices:
+        want = lang.lower().replace("_", "-")
+        voices = [(v.id, _language_tags(v)) for v in engine.getProperty("voices")]
+        exact = [vid for vid, tags in voices if any(want in t for t in tags)]
+        primary = want.split("-")[0]
+        same = [vid for vid, tags in voices if any(t == primary or t.startswith(primary + "-") for t in tags)]
+        _pyttsx3_voices[lang] = (exact or same or [None])[0]
+    return _pyttsx3_voices[lang]
+
+
+def pyttsx3_engine(text, lang, voice, out_path):
+    import pyttsx3
+
+    # pyttsx3 drives one native engine per process and is not thread-safe
+    with _pyttsx3_lock:
+        engine = pyttsx3.init()
+        voice = voice or _pyttsx3_voice(engine, lang)
+        if voice is None:
+            # The default voice would read it with the wrong accent (or not
+            # at all), and the result would be cached under `lang`
+            if shutil.which("espeak-ng") or shutil.which("espeak"):
+                return espeak_engine(text, lang, None, out_path)
+            raise RuntimeError(f"no pyttsx3 voice for {lang}")
+        engine.setProperty("voice", voice)
+        engine.save_to_file(text, out_path)
+        engine.runAndWait()
+
+
+def local_engine():
+    """
+    First offline engine available here.
+    Returns: engine function or None
+    """
+    try:
+        import pyttsx3  # noqa: F401
+        return pyttsx3_engine
+    except ImportError:
+        pass
+    if shutil.which("espeak-ng") or shutil.which("espeak"):
+        return espeak_engine
+    return None
+
+
+class TTSCache:
+    """
+    Synthesized audio on disk, one file per hash of (engine, text, lang,
+    voice), so a reply is only ever synthesized once. Audio is written
+    under a unique temporary name and renamed into place: concurrent
+    sessions never see half a file or overwrite each other's. Once the
+    directory grows past `max_bytes` the least recently used files are
+    deleted, except ones used in the last `min_age` seconds, which a
+    session may be about to stream.
+    """
+
+    def __init__(self, root="tts_cache", engine=None, max_bytes=200 * 2 ** 20, ext=".wav", min_age=60):
+        self.root = root
+        self.engine = engine or local_engine()
+        self.max_bytes = max_bytes
+        self.ext = ext
+        self.min_age = min_age
+        os.makedirs(root, exist_ok=True)
+        # Striped so two sessions asking for the same new reply synthesize it once
+        self._locks = [threading.Lock() for _ in range(32)]
+        self._lock = threading.Lock()
+        self._bytes = sum(size for _, size, _ in self._files())
+        self._stats = {"hits": 0, "misses": 0, "evicted": 0, "synth_seconds": 0.0}
+
+    def key(self, text, lang, voice=None):
+        engine = getattr(self.engine, "__name__", "none")
+        raw = "\0".join([engine, lang or "", voice or "", text])
+        return hashlib.blake2b(raw.encode(), digest_size=20).hexdigest()
+
+    def _files(self):
+        # Temporary files start with "." and are never counted or evicted
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def get(self, text, lang="en-IN", voice=None):
+        """
+        Cached audio for `text`, synthesized on a miss.
+        Returns: path to the audio file
+        """
+        key = self.key(text, lang, voice)
+        path = os.path.join(self.root, key + self.ext)
+        if self._touch(path):
+            return path
+
+        with self._locks[int(key[:8], 16) % len(self._locks)]:
+            if self._touch(path):
+                return path
+            if self.engine is None:
+                raise RuntimeError("no local TTS engine (install pyttsx3 or espeak-ng)")
+            fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".", suffix=self.ext)
+            os.close(fd)
+            start = time.perf_counter()
+            try:
+                self.engine(text, lang, voice, tmp)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            size = os.path.getsize(path)
+
+        with self._lock:
+            self._stats["misses"] += 1
+            self._stats["synth_seconds"] += time.perf_counter() - start
+            self._bytes += size
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+        return path
+
+    def _touch(self, path):
+        # mtime doubles as the LRU clock; atime is often disabled (noatime)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self._stats["hits"] += 1
+        return True
+
+    def evict(self):
+        """Deletes least recently used files until the cache is 90% of `max_bytes`."""
+        files = sorted(self._files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        cutoff = time.time() - self.min_age
+        evicted = 0
+        for path, size, mtime in files:
+            if total <= target or mtime > cutoff:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._bytes = total
+            self._stats["evicted"] += evicted
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, bytes=self._bytes, engine=getattr(self.engine, "__name__", None))
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def text_to_speech(text, lang="en-IN", voice=None, cache=None):
+    """
+    Synthesizes `text` with the local engine, at most once per
+    (text, lang, voice) across sessions.
+    Returns: path to the audio file
+    """
+    global _default_cache
+    if cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = TTSCache()
+        cache = _default_cache
+    return cache.get(text, lang, voice)
+
+
+def autoplay_audio(audio_file, autoplay=True):
+    # Passing the path lets Streamlit serve the file itself instead of
+    # inlining it as base64 in the page
+    ext = os.path.splitext(audio_file)[1].lower()
+    return st.audio(audio_file, format=AUDIO_MIME.get(ext, "audio/wav"), autoplay=autoplay)
@@ -0,0 +1,235 @@
+# vision.py
+# Camera emotion check. OpenCV and the Haar cascade are loaded on first
+# use (or by prewarm()) and then shared by every session in the process.
+import hashlib
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Detection runs on an image about this wide; faces are mapped back afterwards
+DETECT_WIDTH = 320
+# Faces smaller/larger than this fraction of the shorter side are ignored
+MIN_FACE = 0.12
+MAX_FACE = 0.95
+MEMO_SIZE = 128
+
+# Mean face brightness below 90 reads as "sad / low", below 130 as "neutral"
+EMOTION_BANDS = np.array([90, 130])
+EMOTIONS = ("sad / low", "neutral", "positive")
+
+_lock = threading.Lock()
+_loaded = {}
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+# OpenCV releases the GIL while decoding and detecting
+_pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="vision")
+
+
+def load():
+    """
+    Import cv2 and build the face cascade once per process.
+    Returns: dict with "cv2", "cascade" and "load_seconds"
+    """
+    with _lock:
+        if not _loaded:
+            start = time.perf_counter()
+            import cv2
+
+            cascade = cv2.CascadeClassifier(
+                cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+            )
+            _loaded.update(cv2=cv2, cascade=cascade, load_seconds=time.perf_counter() - start)
+        return _loaded
+
+
+def is_loaded():
+    return bool(_loaded)
+
+
+def prewarm():
+    """Load in a background thread so the first camera check doesn't wait."""
+    if not _loaded:
+        threading.Thread(target=load, name="vision-prewarm", daemon=True).start()
+
+
+def image_size(data):
+    """
+    (width, height) from a JPEG or PNG header without decoding, or None.
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        (length,) = struct.unpack(">H", data[i + 2:i + 4])
+        # SOF0..SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def _decode_gray(cv2, image_bytes):
+    """
+    Decode straight to grayscale, letting libjpeg skip work by decoding at
+    1/2, 1/4 or 1/8 size when the image is much wider than DETECT_WIDTH.
+    Returns: (gray image, scale from decoded to original pixels)
+    """
+    size = image_size(image_bytes)
+    flag, factor = cv2.IMREAD_GRAYSCALE, 1
+    if size is not None:
+        for f, reduced in ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+                           (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                           (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)):
+            if size[0] // f >= DETECT_WIDTH:
+                flag, factor = reduced, f
+                break
+    gray = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flag)
+    if gray is None:
+        return None, 1.0
+    if size is not None:
+        return gray, size[0] / gray.shape[1]
+    return gray, float(factor)
+
+
+def detect_faces(image_bytes):
+    """
+    Returns: (faces as an (n, 4) array of x, y, w, h in original-image
+    pixels, the grayscale detection image, its scale to original pixels)
+    """
+    vision = load()
+    cv2 = vision["cv2"]
+
+    gray, scale = _decode_gray(cv2, image_bytes)
+    if gray is None:
+        return np.empty((0, 4), dtype=int), None, 1.0
+
+    if gray.shape[1] > DETECT_WIDTH:
+        shrink = DETECT_WIDTH / gray.shape[1]
+        gray = cv2.resize(gray, None, fx=shrink, fy=shrink, interpolation=cv2.INTER_AREA)
+        scale /= shrink
+
+    short = min(gray.shape)
+    lo, hi = max(int(short * MIN_FACE), 20), int(short * MAX_FACE)
+    faces = vision["cascade"].detectMultiScale(gray, 1.3, 5, minSize=(lo, lo), maxSize=(hi, hi))
+    faces = np.asarray(faces, dtype=float).reshape(-1, 4)
+    return np.rint(faces * scale).astype(int), gray, scale
+
+
+def _memoized(image_bytes, fn):
+    key = (fn.__name__, hashlib.blake2b(image_bytes, digest_size=16).digest())
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    result = fn(image_bytes)
+    with _memo_lock:
+        _memo[key] = result
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return result
+
+
+def face_brightness(gray, boxes):
+    """
+    Mean brightness inside every (x, y, w, h) box at once, from the
+    integral image rather than one slice-and-mean per face.
+    """
+    if len(boxes) == 0:
+        return np.empty(0)
+    cv2 = load()["cv2"]
+    integral = cv2.integral(gray)
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2 = np.minimum(x1 + boxes[:, 2], gray.shape[1])
+    y2 = np.minimum(y1 + boxes[:, 3], gray.shape[0])
+    sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+    return sums / np.maximum((x2 - x1) * (y2 - y1), 1)
+
+
+def emotion_label(brightness):
+    return EMOTIONS[int(np.digitize(brightness, EMOTION_BANDS))]
+
+
+def _analyze_frame(image_bytes):
+    faces, gray, scale = detect_faces(image_bytes)
+    if len(faces) == 0:
+        return {"faces": faces, "brightness": np.empty(0)}
+    boxes = np.rint(faces / scale).astype(int)
+    return {"faces": faces, "brightness": face_brightness(gray, boxes)}
+
+
+def analyze_frame(image_bytes):
+    """
+    Returns: dict with "faces" (n, 4 boxes in original pixels) and
+    "brightness" (mean brightness of each face)
+    """
+    return _memoized(image_bytes, _analyze_frame)
+
+
+def _detect_face_and_emotion(image_bytes):
+    frame = analyze_frame(image_bytes)
+
+    if len(frame["faces"]) == 0:
+        return None, "No face detected"
+
+    # Take first detected face
+    return emotion_label(frame["brightness"][0]), "Face detected"
+
+
+def detect_face_and_emotion(image_bytes):
+    """
+    Very lightweight emotion heuristic. Results are memoized by image
+    content, so reruns with the same camera photo don't detect again.
+    Returns: emotion label or None
+    """
+    return _memoized(image_bytes, _detect_face_and_emotion)
+
+
+def detect_emotion_batch(frames, smoothing=0.5):
+    """
+    Emotion over a burst of frames (oldest first). Frames are analyzed in
+    parallel; each frame's score is the area-weighted brightness of all
+    its faces, and scores are combined with an exponential moving average
+    so later frames count more without one odd frame flipping the result.
+
+    Confidence is the share of frames with a face times the share of
+    those frames whose own label matches the smoothed one.
+    Returns: (emotion label or None, confidence in [0, 1], per-frame labels)
+    """
+    if not frames:
+        return None, 0.0, []
+    analyzed = list(_pool.map(analyze_frame, frames))
+
+    scores = np.full(len(frames), np.nan)
+    for i, frame in enumerate(analyzed):
+        if len(frame["faces"]):
+            areas = frame["faces"][:, 2] * frame["faces"][:, 3]
+            scores[i] = np.average(frame["brightness"], weights=areas)
+
+    seen = scores[~np.isnan(scores)]
+    per_frame = [None if np.isnan(v) else emotion_label(v) for v in scores]
+    if len(seen) == 0:
+        return None, 0.0, per_frame
+
+    # EMA weights: the newest frame gets `smoothing`, older ones decay geometrically
+    weights = (1 - smoothing) ** np.arange(len(seen))[::-1]
+    smoothed = np.average(seen, weights=weights)
+    emotion = emotion_label(smoothed)
+
+    labels = np.array([emotion_label(v) for v in seen])
+    confidence = (len(seen) / len(frames)) * float(np.mean(labels == emotion))
+    return emotion, confidence, per_frame